@@ -1,8 +1,8 @@
 import streamlit as st
 import os
-import asyncio
 import html
-from pydantic_ai import Agent
+from agents import get_agent
+from async_runner import run_async
 from pydantic import BaseModel, Field
 from typing import List, Literal, Optional
 
@@ -30,22 +30,6 @@ st.write("3 features only: Review Summary · Translation · AI Chatbot")
 # ==============================================================================
 # HELPERS
 # ==============================================================================
-def run_async(coro):
-    """
-    Streamlit sometimes runs in an environment where asyncio.run may conflict.
-    This helper tries asyncio.run first, then falls back to creating a new loop.
-    """
-    try:
-        return asyncio.run(coro)
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        try:
-            asyncio.set_event_loop(loop)
-            return loop.run_until_complete(coro)
-        finally:
-            loop.close()
-
-
 def safe(s: str) -> str:
     """Escape any model/user text before inserting into HTML."""
     return html.escape(s or "")
@@ -203,11 +187,7 @@ with right_column:
 
                         async def gen_review_summary():
                             persona = system_prompt
-                            agent = Agent(
-                                "openai:gpt-4o-mini",
-                                output_type=ReviewSummary,
-                                system_prompt=persona,
-                            )
+                            agent = get_agent("openai:gpt-4o-mini", ReviewSummary, persona)
                             prompt = f"""
 TASK: Summarize reviews for an Olive Young product.
 
@@ -280,11 +260,7 @@ Rules:
                             )
 
                         async def gen_translation():
-                            agent = Agent(
-                                "openai:gpt-4o-mini",
-                                output_type=TranslationResult,
-                                system_prompt=system_prompt,
-                            )
+                            agent = get_agent("openai:gpt-4o-mini", TranslationResult, system_prompt)
                             prompt = f"""
 TASK: Translate the text.
 
@@ -335,11 +311,7 @@ Rules:
                             safety_note: str = Field(description="One short safety note (e.g., patch test)")
 
                         async def gen_chatbot():
-                            agent = Agent(
-                                "openai:gpt-4o-mini",
-                                output_type=ChatbotAnswer,
-                                system_prompt=system_prompt,
-                            )
+                            agent = get_agent("openai:gpt-4o-mini", ChatbotAnswer, system_prompt)
                             prompt = f"""
 TASK: Answer the customer's question as an Olive Young in-store assistant.
 Use ONLY the provided product context and review hint.
@@ -1,11 +1,17 @@
+import contextlib
+import html
+import json
 import os
-import asyncio
+import queue
+import time
+import uuid
 import streamlit as st
 import streamlit.components.v1 as components
 
 # ✅ NEW: pydantic_ai가 없을 때 Streamlit Cloud에서 안내 메시지
 try:
-    from pydantic_ai import Agent
+    # Dependency check only: the agents themselves are built in agents.py
+    import pydantic_ai  # noqa: F401
 except ModuleNotFoundError:
     st.error(
         "Missing dependency: pydantic_ai\n\n"
@@ -13,8 +19,30 @@ except ModuleNotFoundError:
     )
     st.stop()
 
-from pydantic import BaseModel, Field
-from typing import List, Literal, Optional
+from async_runner import DEFAULT_TIMEOUT, cancel, iterate, run_async, submit
+from catalog import REVIEW_PAGE_SIZE, get_catalog
+from flows import (
+    DEFAULT_PERSONA,
+    gen_chat,
+    gen_translation,
+    get_or_generate_summary,
+    get_precomputed_summary,
+    get_stored_review_translations,
+    run_all,
+    stream_chat,
+    stream_translation,
+    translate_reviews,
+)
+from llm_cache import get_cache, inflight_stats
+from prefetch import TransitionModel, get_prefetcher, prefetch_summaries, record_view
+from request_log import get_logger, tagged
+from result_store import fingerprint
+from review_sentiment import is_local, local_summary
+from schemas import ReviewSummary
+from skin_scores import SKIN_TYPES, get_engine
+from timing import TraceLog, span, trace
+
+DEBUG_TRACES = 20  # requests kept in the debug panel
 
 
 # ==============================================================================
@@ -38,19 +66,13 @@ st.title("🧴 Olive Young QR Demo (n8n Logic → Streamlit)")
 # ==============================================================================
 # HELPERS
 # ==============================================================================
-def run_async(coro):
-    """Run a coroutine safely in Streamlit."""
-    try:
-        return asyncio.run(coro)
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        try:
-            asyncio.set_event_loop(loop)
-            return loop.run_until_complete(coro)
-        finally:
-            loop.close()
+def safe(s) -> str:
+    """Escape any model/user text before inserting into HTML."""
+    return html.escape(str(s or ""))
+
 
 def render_card(title: str, badge: str, body_html: str):
+    title, badge = safe(title), safe(badge)
     return f"""
     <div style="background:#fff;border-radius:18px;padding:20px;border:1px solid #eaeaea;
                 box-shadow:0 10px 25px rgba(0,0,0,0.08);max-width:760px;margin:0 auto;">
@@ -63,74 +85,176 @@ def render_card(title: str, badge: str, body_html: str):
     </div>
     """
 
+
+def summary_body(d, target_lang=None):
+    return f"""
+      <div style="font-size:12px;color:#777;margin-bottom:8px;">Sentiment: <b>{safe(d.overall_sentiment)}</b></div>
+      <div style="padding:12px;border:1px solid #eee;border-radius:12px;background:#fafafa;margin-bottom:10px;">
+        <b>One-line</b><br>{safe(d.one_line_summary)}
+      </div>
+      <div style="display:grid;grid-template-columns:1fr 1fr;gap:12px;">
+        <div style="border:1px solid #eee;border-radius:12px;padding:12px;">
+          <b>Pros</b><ul>{''.join(f'<li>{safe(p)}</li>' for p in d.pros)}</ul>
+        </div>
+        <div style="border:1px solid #eee;border-radius:12px;padding:12px;">
+          <b>Cons</b><ul>{''.join(f'<li>{safe(c)}</li>' for c in d.cons)}</ul>
+        </div>
+      </div>
+    """
+
+
+def translation_body(d, target_lang=None):
+    return f"""
+      <div style="font-size:12px;color:#777;margin-bottom:8px;">Target: <b>{safe(target_lang)}</b></div>
+      <div style="white-space:pre-wrap;padding:12px;border:1px solid #eee;border-radius:12px;background:#fafafa;">
+        {safe(d.translated_text)}
+      </div>
+    """
+
+
+def chat_body(d, target_lang=None):
+    return f"""
+      <div style="border:1px solid #eee;border-radius:12px;padding:12px;background:#fafafa;white-space:pre-wrap;">
+        <b>Answer</b><br>{safe(d.answer)}
+      </div>
+      <div style="margin-top:10px;font-size:12px;color:#666;">
+        <b>Safety</b>: {safe(d.safety_note)}
+      </div>
+    """
+
+
+def inline_html(card_html: str) -> str:
+    """Card HTML that st.markdown renders as HTML: indented lines would be a code block
+    and a blank line would end the HTML block, so both are stripped (as in week11.py)."""
+    return "\n".join(line.strip() for line in card_html.splitlines() if line.strip())
+
+
+# name → (title, body builder, iframe height)
+RESULT_CARDS = {
+    "review_summary": ("Review Summary", summary_body, 420),
+    "translation": ("Translation", translation_body, 260),
+    "chat_answer": ("AI Chatbot", chat_body, 320),
+}
+
+
+# Rendered HTML is memoized by content hash; args starting with "_" are not hashed by Streamlit.
+# Escaping happens here, once per distinct content, and identical HTML keeps the iframe mounted.
+@st.cache_data(max_entries=1024, show_spinner=False)
+def result_card_html(name: str, product_id: str, result_key: str, target_lang: str, badge: str, _d) -> str:
+    title, body, _ = RESULT_CARDS[name]
+    return render_card(title, badge, body(_d, target_lang))
+
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def local_review_summary(product_id: str, reviews_key: str, _reviews: list):
+    return local_summary(_reviews)  # lexicon pass over every review: once per product and review set
+
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def product_card_html(product_id: str, content_key: str, review_page: int, review_total: int, review_pages: int,
+                      duplicates_hidden: int, _productData: dict, _page_reviews: list, _skin_counts) -> str:
+    productData, page_reviews, skin_counts = _productData, _page_reviews, _skin_counts
+    img = productData.get("image_url", "")
+    img_html = ""
+    if img:
+        img_html = f"""
+          <img src="{safe(img)}" style="width:100%;max-width:380px;max-height:380px;object-fit:cover;
+                                  border-radius:16px;border:1px solid #eee;display:block;margin-bottom:10px;">
+        """
+
+    skin_html = ""
+    if skin_counts and any(skin_counts.values()):
+        top = max(skin_counts.values())
+        skin_html = "".join(
+            f"""
+          <div style="display:flex;align-items:center;gap:8px;font-size:12px;margin-bottom:4px;">
+            <div style="width:90px;color:#555;">{t.replace("_", " ")}</div>
+            <div style="flex:1;background:#f2f2f2;border-radius:999px;height:8px;">
+              <div style="width:{100 * skin_counts[t] // top}%;background:#111;border-radius:999px;height:8px;"></div>
+            </div>
+            <div style="width:28px;text-align:right;font-weight:800;">{skin_counts[t]}</div>
+          </div>
+            """
+            for t in SKIN_TYPES
+        )
+        skin_html = f"""
+      <div style="font-size:12px;color:#777;margin:12px 0 8px 0;">Skin types mentioned in reviews</div>
+      {skin_html}
+        """
+
+    reviews_html = "No reviews for this product_id."
+    if page_reviews:
+        reviews_html = "".join(
+        f"""
+            <div style="border:1px solid #eee;border-radius:12px;padding:12px;background:#fff;margin-bottom:10px;">
+          <div style="font-size:12px;color:#777;margin-bottom:6px;"><b>Review {i+1}</b></div>
+          <div style="font-size:13px;line-height:1.6;color:#333;white-space:pre-wrap;">{safe(rv)}</div>
+        </div>
+        """
+        for i, rv in enumerate(page_reviews, start=review_page * REVIEW_PAGE_SIZE)
+    )
+
+    dup_html = f" · {duplicates_hidden} duplicate review{'s' * (duplicates_hidden != 1)} hidden" if duplicates_hidden else ""
+
+    product_body = f"""
+      <div style="display:flex;gap:16px;flex-wrap:wrap;">
+        <div style="flex:1;min-width:260px;">{img_html}</div>
+        <div style="flex:1;min-width:260px;">
+          <div style="font-size:12px;color:#777;">Product</div>
+          <div style="font-size:22px;font-weight:900;margin:6px 0 10px 0;">{safe(productData.get("name",""))}</div>
+          <div style="font-size:12px;color:#777;">Description</div>
+          <div style="font-size:14px;line-height:1.5;margin-top:6px;">{safe(productData.get("description",""))}</div>
+          <div style="margin-top:12px;font-size:12px;color:#777;">Price</div>
+          <div style="font-size:28px;font-weight:900;">₩ {productData.get("price",0):,}</div>
+          {skin_html}
+        </div>
+      </div>
+      <hr style="border:none;border-top:1px solid #eee;margin:14px 0;">
+      <div style="font-size:12px;color:#777;margin-bottom:8px;">Reviews: <b>{review_total}</b> · page {review_page + 1}/{review_pages}{dup_html}</div>
+      <div>
+  {reviews_html}
+</div>
+
+    """
+    return render_card("Product Card", f"product_id={product_id}", product_body)
+
+
 # ==============================================================================
-# n8n-like product_id → productData, reviews
+# Catalog (loaded once per server process, O(1) lookup by product_id)
 # ==============================================================================
-def get_product_payload(product_id: str):
-    productData = {}
-    reviews = []
-
-    if product_id == "1":
-        productData = {
-            "name": "Round Lab 1025 Dokdo Toner 500 ml Special Set",
-            "image_url": "https://image.oliveyoung.co.kr/cfimages/cf-goods/uploads/images/thumbnails/10/0000/0013/A00000013718040ko.jpg?l=ko&QT=85&SF=webp&sharpen=1x0.5",
-            "description": "A gentle hydrating toner for dry and sensitive skin.",
-            "price": 27000
-        }
-        reviews = [
-            "I use it after washing my face in the morning and evening. It absorbs well without itching or stickiness.",
-            "I'm using it all the time. It's dry, but I'm using it all four seasons.",
-            "This toner contains a perfect balance of high-molecular-weight and low-molecular-weight hyaluronic acid, fundamentally restoring the skin barrier. In particular, it helps maintain the skin’s pH balance perfectly, drastically reducing the likelihood of breakouts. It’s rare to find this kind of ingredient composition at this price point."
-        ]
-    elif product_id == "2":
-        productData = {
-            "name": "Torriden Dive Hyaluronic Acid Soothing Cream",
-            "image_url": "https://image.oliveyoung.co.kr/cfimages/cf-goods/uploads/images/thumbnails/10/0000/0016/A00000016559833ko.jpg?l=ko&QT=85&SF=webp&sharpen=1x0.5",
-            "description": "Soothing cream that can help soothe moisture and heat even after a while.",
-            "price": 15500
-        }
-        reviews = [
-            "I have sensitive skin, so if it doesn't fit, my skin will turn upside down. This is good because it's gentle. It moisturizes well, so I've been buying and using it well.",
-            "It's a cream that soothes irritated skin well. I use it after using a peeling product, and it helps a lot with soothing.",
-            "The cream has a light texture that absorbs quickly into the skin without leaving a greasy residue. It provides long-lasting hydration, making my skin feel soft and supple throughout the day.",
-            "It's light on application and has almost no white cast, so it's good for daily use. It absorbs quickly without stickiness, so there's no pushiness even if you apply it before makeup, and it's comfortable even after outdoor activities. It has enough UV protection, so I'm using it with confidence even in the summer. It's sensitive skin, and it fits well without any trouble."
-        ]
-    elif product_id == "3":
-        productData = {
-            "name": "[Manggom Collaboration] Aviv Eoseongcho Teka Capsule Serum Calming Drop 50 ml Double Plan (+Luggage Tag)",
-            "image_url": "https://image.oliveyoung.co.kr/cfimages/cf-goods/uploads/images/thumbnails/10/0000/0024/A00000024567211ko.jpg?l=ko&QT=85&SF=webp&sharpen=1x0.5",
-            "description": "Trouble soothing capsules that help with excessive oil and sebum care help to effectively soothe the skin without irritation.",
-            "price": 29800
-        }
-        reviews = [
-            "It's a serum I've been using very well, but I heard that there was a collaboration between Manggom and I already had it, so I bought it additionally! This is a really good serum for acne control, but it's very moist, so I've been using this one most of the time these days!",
-            "The texture is light and fresh, so it absorbs quickly into the skin.",
-            "The more you use it, the more comfortable your skin is, and it fits well for soothing before getting any trouble. It's not sticky, so it's good for layering with other base products.",
-            "It's light on application and has almost no white cast, so it's good for daily use. It absorbs quickly without stickiness, so there's no pushiness even if you apply it before makeup, and it's comfortable even after outdoor activities. It has enough UV protection, so I'm using it with confidence even in the summer. It's sensitive skin, and it fits well without any trouble."
-        ]
-    else:
-        productData = {
-            "name": "Vanilla Co Clean It Zero Pore Clarifying Cleansing Balm 100 ml",
-            "image_url": "https://image.oliveyoung.co.kr/cfimages/cf-goods/uploads/images/thumbnails/10/0000/0020/A00000020267821ko.jpg?l=ko&QT=85&SF=webp&sharpen=1x0.5",
-            "description": "Smoother oil balm formula melts from blackheads embedded to rough dead skin cells to smooth skin texture!",
-            "price": 14800
-        }
-        reviews = [
-            "It's a cleansing balm that's good for daily use. It's gentle and moist.",
-            "I'm always using this product, but I can't stand Manggom! Why is Costa so cute and the composition of the 3 travel items is also very good! I wanted to buy pink, but I'm still using pink because it's for winter and I bought green for the spring and summer when it's going to be warm.",
-            "Manggom's collaboration product. Manggom did everything cute. I bought it.",
-            "It's easy to remove dead skin cells and it cleanses well. I don't know how many times I bought it."
-        ]
-
-    return productData, reviews
+@st.cache_resource
+def load_catalog():
+    return get_catalog()
+
+catalog = load_catalog()
+
+
+@st.cache_resource
+def load_transitions():
+    return TransitionModel.from_log()  # which product shoppers scan next, from past sessions
+
+transitions = load_transitions()
 
 
+@st.cache_resource
+def load_skin_scores():
+    engine = get_engine()
+    try:
+        engine.sync(exclude=catalog.collapsed_offsets)  # reviews appended since the last run, minus duplicates
+    except RuntimeError as e:
+        # e.g. reviews.jsonl replaced by a shorter file: keep serving the last saved counts
+        get_logger().log({"ts": time.time(), "event": "skin_scores_sync_failed", "error": str(e)})
+    return engine
+
+skin_engine = load_skin_scores()
+
 # ==============================================================================
 # Read query param (Streamlit new API)
 # ==============================================================================
 # URL example: http://localhost:8501/?product_id=1
-product_id = st.query_params.get("product_id", "1")  # default "1"
-productData, reviews = get_product_payload(str(product_id))
+product_id = catalog.resolve(st.query_params.get("product_id", "1"))  # default "1"
+productData, reviews = catalog.payload(product_id)
+review_index = catalog.review_index(product_id)  # BM25 over this product's reviews (chatbot retrieval)
 
 # ==============================================================================
 # Session state for outputs (one-screen UX)
@@ -138,6 +262,19 @@ productData, reviews = get_product_payload(str(product_id))
 st.session_state.setdefault("review_summary", None)
 st.session_state.setdefault("translation", None)
 st.session_state.setdefault("chat_answer", None)
+st.session_state.setdefault("traces", TraceLog(DEBUG_TRACES))
+st.session_state.setdefault("session_id", uuid.uuid4().hex[:12])
+session_id = st.session_state.session_id
+
+# New product scanned → drop results that belong to the previous product
+if st.session_state.get("loaded_product_id") != product_id:
+    st.session_state.loaded_product_id = product_id
+    transitions.observe(session_id, product_id)
+    record_view(session_id, product_id)
+    st.session_state.review_summary = None
+    st.session_state.translation = None
+    st.session_state.chat_answer = None
+    st.session_state.run_all_timings = None
 
 # ==============================================================================
 # LAYOUT
@@ -157,8 +294,8 @@ with left:
         st.markdown("#### 🏷️ Product Selector (Demo)")
         pid = st.selectbox(
             "product_id",
-            options=["1", "2", "3", "4"],
-            index=(["1", "2", "3", "4"].index(query_pid) if query_pid in ["1","2","3","4"] else 0),
+            options=catalog.product_ids,
+            index=(catalog.product_ids.index(query_pid) if query_pid in catalog else 0),
         )
 
         if pid != query_pid:
@@ -184,16 +321,20 @@ with left:
         else:
             st.caption("🔴 Locked")
 
+        cache_stats = get_cache().stats()
+        st.caption(
+            f"⚡ Response cache: {cache_stats['entries']} entries · "
+            f"{cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%}) · {inflight_stats().get('coalesced', 0)} coalesced"
+        )
+
     # Inputs
     with st.container(border=True):
         st.markdown("#### 2️⃣ Inputs")
 
         system_prompt = st.text_area(
             "System Persona",
-            value=(
-                "You are an Olive Young in-store assistant. "
-                "Be concise, neutral, and practical. Avoid exaggerated marketing."
-            ),
+            value=DEFAULT_PERSONA,
             height=100,
         )
 
@@ -212,6 +353,18 @@ with left:
             height=80
         )
 
+        stream_mode = st.toggle("Stream chatbot & translation answers", value=True)
+
+# ==============================================================================
+# Speculative prefetch: warm this product's summary (and the likely next products')
+# in the background, so the first "Review Summary" click is usually a store hit
+# ==============================================================================
+if api_key and st.session_state.get("prefetched_for") != (product_id, system_prompt):
+    st.session_state.prefetched_for = (product_id, system_prompt)
+    prefetcher = get_prefetcher()
+    prefetcher.cancel_group(session_id)  # shopper moved on: drop what hasn't started yet
+    prefetch_summaries(prefetcher, catalog, [product_id, *transitions.next_products(product_id)], system_prompt, session_id)
+
 # ==============================================================================
 # RIGHT: One-screen dashboard (product + buttons + results)
 # ==============================================================================
@@ -219,172 +372,196 @@ with right:
     st.subheader("📱 Product Page (QR landing)")
 
     # Product Card
-    img = productData.get("image_url", "")
-    img_html = ""
-    if img:
-        img_html = f"""
-          <img src="{img}" style="width:100%;max-width:380px;max-height:380px;object-fit:cover;
-                                  border-radius:16px;border:1px solid #eee;display:block;margin-bottom:10px;">
-        """
-
-    reviews_html = "No reviews for this product_id."
-    if reviews:
-        reviews_html = "".join(
-        f"""
-            <div style="border:1px solid #eee;border-radius:12px;padding:12px;background:#fff;margin-bottom:10px;">
-          <div style="font-size:12px;color:#777;margin-bottom:6px;"><b>Review {i+1}</b></div>
-          <div style="font-size:13px;line-height:1.6;color:#333;white-space:pre-wrap;">{rv}</div>
-        </div>
-        """
-        for i, rv in enumerate(reviews[:5])
+    review_total = catalog.review_count(product_id)
+    review_pages = catalog.page_count(product_id)
+    review_page = 0
+    if review_pages > 1:
+        review_page = st.number_input("Review page", min_value=1, max_value=review_pages, value=1) - 1
+    page_reviews = catalog.get_reviews(product_id, page=review_page)
+
+    # Foreign shoppers: whole review list in the selected language (one batched call, then stored)
+    show_translated = st.toggle(f"🌐 Show reviews in {target_lang}", value=False)
+    if show_translated and reviews:
+        translated_reviews = get_stored_review_translations(product_id, reviews, target_lang)
+        if translated_reviews is None and not api_key:
+            st.warning("🔒 Activate Phase 1 to translate reviews.")
+        elif translated_reviews is None:
+            with st.spinner(f"✨ Translating {len(reviews)} reviews..."):
+                try:
+                    translated_reviews = run_async(tagged(translate_reviews(product_id, reviews, target_lang, system_prompt), product_id=product_id, session_id=session_id))
+                except Exception as e:
+                    st.error(f"Couldn't translate the reviews: {e}")
+        if translated_reviews is not None:
+            start = review_page * REVIEW_PAGE_SIZE
+            page_reviews = translated_reviews[start:start + REVIEW_PAGE_SIZE]
+
+    skin_counts = skin_engine.get(product_id)
+    product_key = fingerprint(productData, page_reviews, skin_counts)
+    components.html(
+        product_card_html(
+            product_id, product_key, review_page, review_total, review_pages,
+            sum(catalog.duplicates(product_id).values()), productData, page_reviews, skin_counts,
+        ),
+        height=680,
+        scrolling=True,
     )
 
-
-    product_body = f"""
-      <div style="display:flex;gap:16px;flex-wrap:wrap;">
-        <div style="flex:1;min-width:260px;">{img_html}</div>
-        <div style="flex:1;min-width:260px;">
-          <div style="font-size:12px;color:#777;">Product</div>
-          <div style="font-size:22px;font-weight:900;margin:6px 0 10px 0;">{productData.get("name","")}</div>
-          <div style="font-size:12px;color:#777;">Description</div>
-          <div style="font-size:14px;line-height:1.5;margin-top:6px;">{productData.get("description","")}</div>
-          <div style="margin-top:12px;font-size:12px;color:#777;">Price</div>
-          <div style="font-size:28px;font-weight:900;">₩ {productData.get("price",0):,}</div>
-        </div>
-      </div>
-      <hr style="border:none;border-top:1px solid #eee;margin:14px 0;">
-      <div style="font-size:12px;color:#777;margin-bottom:8px;">Reviews loaded: <b>{len(reviews)}</b></div>
-      <div>
-  {reviews_html}
-</div>
-
-    """
-    components.html(render_card("Product Card", f"product_id={product_id}", product_body), height=680, scrolling=True)
-
     # Action buttons (one screen)
     c1, c2, c3 = st.columns(3)
     do_summary = c1.button("🧾 Review Summary", use_container_width=True)
     do_translate = c2.button("🌐 Translate", use_container_width=True)
     do_chat = c3.button("💬 AI Chatbot", use_container_width=True)
+    do_run_all = st.button("⚡ Run all (concurrent)", type="primary", use_container_width=True)
+
+    # Guard: without a key only the review summary button works (local lexicon summary, no model call)
+    if (do_translate or do_chat or do_run_all) and not api_key:
+        st.warning("🔒 Activate Phase 1 with your API Key for translation and the chatbot.")
+        do_translate = do_chat = do_run_all = False
+
+    # Result cards: (title, body builder, iframe height) + one slot each
+    cards = {name: (*spec, st.empty()) for name, spec in RESULT_CARDS.items()}
+    timing_slot = st.empty()
+    failed = set()
+
+    def show_card(name, d, live=False):
+        title, body, height, slot = cards[name]
+        if live:
+            # Partial output while streaming: plain markdown, no iframe re-mount per token
+            slot.markdown(inline_html(render_card(title, "AI · streaming", body(d, target_lang))), unsafe_allow_html=True)
+        else:
+            # Same result → byte-identical HTML → the iframe is left alone on rerun
+            with span("render", card=name), slot.container():
+                badge = "Local" if isinstance(d, ReviewSummary) and is_local(d) else "AI"
+                card_html = result_card_html(name, product_id, fingerprint(d.model_dump_json(), target_lang), target_lang, badge, d)
+                components.html(card_html, height=height, scrolling=True)
+
+    def stream_into(name, agen):
+        d = None
+        for d in iterate(tagged(agen, product_id=product_id, session_id=session_id)):
+            show_card(name, d, live=True)
+        return d
+
+    # One trace per button press: every phase below (and in flows / llm_cache) becomes a span
+    action = next(
+        (n for n, pressed in [("summary", do_summary), ("translation", do_translate), ("chat", do_chat), ("run_all", do_run_all)] if pressed),
+        None,
+    )
+    # Closed (and logged) even if a section raises, so the span context never leaks into the next rerun
+    with contextlib.ExitStack() as action_trace:
+        if action:
+            action_trace.enter_context(trace(action, st.session_state.traces, product_id=product_id))
+
+        # --- 1) Review Summary ---
+        # Precomputed by precompute_summaries.py → served instantly on QR landing;
+        # otherwise the local summary when it is confident (or there is no key to do better)
+        if st.session_state.review_summary is None:
+            st.session_state.review_summary = get_precomputed_summary(product_id, reviews, system_prompt)
+            if st.session_state.review_summary is None:
+                local = local_review_summary(product_id, fingerprint(reviews), reviews)
+                if local.confident or not api_key:
+                    st.session_state.review_summary = local.summary
+
+        if do_summary:
+            with st.spinner("✨ Summarizing reviews..."):
+                st.session_state.review_summary = run_async(
+                    tagged(
+                        get_or_generate_summary(product_id, productData, reviews, system_prompt, allow_llm=bool(api_key)),
+                        product_id=product_id,
+                        session_id=session_id,
+                    )
+                )
+
+        # --- 2) Translation ---
+        if do_translate:
+            if stream_mode:
+                st.session_state.translation = stream_into(
+                    "translation", stream_translation(text_to_translate, target_lang, system_prompt)
+                )
+            else:
+                with st.spinner("✨ Translating..."):
+                    st.session_state.translation = run_async(
+                        tagged(gen_translation(text_to_translate, target_lang, system_prompt), product_id=product_id, session_id=session_id)
+                    )
+
+        # --- 3) Chatbot ---
+        if do_chat:
+            if stream_mode:
+                st.session_state.chat_answer = stream_into(
+                    "chat_answer", stream_chat(productData, reviews, user_question, system_prompt, review_index)
+                )
+            else:
+                with st.spinner("✨ Generating answer..."):
+                    st.session_state.chat_answer = run_async(
+                        tagged(gen_chat(productData, reviews, user_question, system_prompt, review_index), product_id=product_id, session_id=session_id)
+                    )
+
+        # --- 4) Run all: three agent runs at once, each card rendered as it arrives ---
+        if do_run_all:
+            tasks = {"review_summary": get_or_generate_summary(product_id, productData, reviews, system_prompt)}
+            if text_to_translate.strip():
+                tasks["translation"] = gen_translation(text_to_translate, target_lang, system_prompt)
+            tasks["chat_answer"] = gen_chat(productData, reviews, user_question, system_prompt, review_index)
+
+            done = queue.Queue()
+            t0 = time.perf_counter()
+            fut = submit(tagged(run_all(tasks, on_done=done.put), product_id=product_id, session_id=session_id))
+            timings = {}
+            pending = set(tasks)
+            deadline = t0 + DEFAULT_TIMEOUT  # one budget for the whole run, not per card
+            try:
+                with st.spinner(f"✨ Running {len(tasks)} AI tasks concurrently..."):
+                    while pending:
+                        try:
+                            item = done.get(timeout=max(0.0, deadline - time.perf_counter()))
+                        except queue.Empty:
+                            for name in pending:
+                                failed.add(name)
+                                cards[name][3].error(f"{name} timed out after {DEFAULT_TIMEOUT:g}s")
+                            break
+                        pending.discard(item.name)
+                        timings[item.name] = item.seconds
+                        if item.error is not None:
+                            failed.add(item.name)
+                            cards[item.name][3].error(f"{item.name} failed: {item.error}")
+                            continue
+                        st.session_state[item.name] = item.output
+                        show_card(item.name, item.output)
+            finally:
+                if not fut.done():  # timed out, or the script was stopped mid-run
+                    cancel(fut)
+            st.session_state.run_all_timings = {"tasks": timings, "wall": time.perf_counter() - t0}
+
+        # Render results (persist on same screen)
+        for name in cards:
+            if st.session_state[name] and name not in failed:
+                show_card(name, st.session_state[name])
+
+    if st.session_state.get("run_all_timings"):
+        t = st.session_state.run_all_timings
+        timing_slot.caption(
+            "⏱ " + " · ".join(f"{k} {v:.2f}s" for k, v in t["tasks"].items())
+            + f" · wall {t['wall']:.2f}s (sum {sum(t['tasks'].values()):.2f}s)"
+        )
 
-    # Guard
-    if (do_summary or do_translate or do_chat) and not api_key:
-        st.error("🔒 Please activate Phase 1 with your API Key.")
-        st.stop()
-
-    # --- 1) Review Summary ---
-    if do_summary:
-        class ReviewSummary(BaseModel):
-            overall_sentiment: Literal["positive", "mixed", "negative"] = Field(description="Overall sentiment")
-            one_line_summary: str = Field(description="One sentence summary")
-            pros: List[str] = Field(description="Top 3 pros")
-            cons: List[str] = Field(description="Top 3 cons")
-
-        async def gen_review_summary():
-            agent = Agent("openai:gpt-4o-mini", output_type=ReviewSummary, system_prompt=system_prompt)
-            prompt = f"""
-Summarize customer reviews for this product.
-
-Product: {productData.get("name")}
-Reviews:
-{chr(10).join(reviews)}
-
-Rules:
-- pros/cons max 3 each
-- neutral, practical tone
-"""
-            r = await agent.run(prompt)
-            return r.output
-
-        with st.spinner("✨ Summarizing reviews..."):
-            st.session_state.review_summary = run_async(gen_review_summary())
-
-    # --- 2) Translation ---
-    if do_translate:
-        class Translation(BaseModel):
-            translated_text: str = Field(description="Translated text")
-
-        async def gen_translation():
-            agent = Agent("openai:gpt-4o-mini", output_type=Translation, system_prompt=system_prompt)
-            prompt = f"""
-Translate the following text to {target_lang}.
-
-Text:
-{text_to_translate}
-"""
-            r = await agent.run(prompt)
-            return r.output
-
-        with st.spinner("✨ Translating..."):
-            st.session_state.translation = run_async(gen_translation())
-
-    # --- 3) Chatbot ---
-    if do_chat:
-        class ChatAnswer(BaseModel):
-            answer: str = Field(description="Answer in 3-5 sentences")
-            safety_note: str = Field(description="One short safety note")
-
-        async def gen_chat():
-            agent = Agent("openai:gpt-4o-mini", output_type=ChatAnswer, system_prompt=system_prompt)
-            prompt = f"""
-You are an in-store assistant. Answer the customer's question using only the product info and reviews below.
-
-Product info:
-{productData}
-
-Reviews:
-{reviews}
-
-Customer question:
-{user_question}
-
-Rules:
-- If uncertain, say what's missing briefly
-- Include a short safety_note (patch test/irritation caution when relevant)
-"""
-            r = await agent.run(prompt)
-            return r.output
-
-        with st.spinner("✨ Generating answer..."):
-            st.session_state.chat_answer = run_async(gen_chat())
-
-    # Render results (persist on same screen)
-    if st.session_state.review_summary:
-        d = st.session_state.review_summary
-        body = f"""
-          <div style="font-size:12px;color:#777;margin-bottom:8px;">Sentiment: <b>{d.overall_sentiment}</b></div>
-          <div style="padding:12px;border:1px solid #eee;border-radius:12px;background:#fafafa;margin-bottom:10px;">
-            <b>One-line</b><br>{d.one_line_summary}
-          </div>
-          <div style="display:grid;grid-template-columns:1fr 1fr;gap:12px;">
-            <div style="border:1px solid #eee;border-radius:12px;padding:12px;">
-              <b>Pros</b><ul>{''.join(f'<li>{p}</li>' for p in d.pros)}</ul>
-            </div>
-            <div style="border:1px solid #eee;border-radius:12px;padding:12px;">
-              <b>Cons</b><ul>{''.join(f'<li>{c}</li>' for c in d.cons)}</ul>
-            </div>
-          </div>
-        """
-        components.html(render_card("Review Summary", "AI", body), height=420, scrolling=True)
-
-    if st.session_state.translation:
-        d = st.session_state.translation
-        body = f"""
-          <div style="font-size:12px;color:#777;margin-bottom:8px;">Target: <b>{target_lang}</b></div>
-          <div style="white-space:pre-wrap;padding:12px;border:1px solid #eee;border-radius:12px;background:#fafafa;">
-            {d.translated_text}
-          </div>
-        """
-        components.html(render_card("Translation", "AI", body), height=260, scrolling=True)
-
-    if st.session_state.chat_answer:
-        d = st.session_state.chat_answer
-        body = f"""
-          <div style="border:1px solid #eee;border-radius:12px;padding:12px;background:#fafafa;white-space:pre-wrap;">
-            <b>Answer</b><br>{d.answer}
-          </div>
-          <div style="margin-top:10px;font-size:12px;color:#666;">
-            <b>Safety</b>: {d.safety_note}
-          </div>
-        """
-        components.html(render_card("AI Chatbot", "AI", body), height=320, scrolling=True)
+    # Debug panel: where the seconds of the last N button presses went
+    with st.expander("🔍 Debug · timings & tokens"):
+        traces = st.session_state.traces.items()
+        if not traces:
+            st.caption("Press a button to record a trace.")
+        else:
+            st.dataframe(
+                [
+                    {"#": i, "action": r.name, "product_id": r.attrs.get("product_id"), "ms": round(r.ms), **r.totals()}
+                    for i, r in reversed(list(enumerate(traces, start=1)))
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
+            pick = st.selectbox("Span tree", range(len(traces), 0, -1), format_func=lambda i: f"#{i} {traces[i - 1].name}")
+            st.code(traces[pick - 1].format(), language=None)
+            st.download_button(
+                "⬇️ Export traces (JSON)",
+                data=json.dumps(st.session_state.traces.export(), indent=2, ensure_ascii=False),
+                file_name="olive_traces.json",
+                mime="application/json",
+            )
@@ -0,0 +1,109 @@
+"""
+Process-wide Agent registry on a shared keep-alive HTTP connection pool.
+
+Agents are built once per (model, output schema, system_prompt, API key) and
+reused across Streamlit reruns and sessions. OpenAI models share one pooled
+httpx.AsyncClient, so TLS connections survive between clicks.
+
+Note: an httpx.AsyncClient belongs to the event loop it was first used on,
+so there is one pool (and one set of OpenAI agents) per running loop. Calls
+alternating between loops reuse their own pool instead of rebuilding it, and
+a loop's pool and agents are dropped once that loop is closed.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Type
+
+import httpx
+from pydantic import BaseModel
+from pydantic_ai import Agent
+
+from llm_cache import schema_hash
+
+MAX_AGENTS = 128
+
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=90)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+_lock = threading.Lock()
+_agents: "OrderedDict[tuple, Agent]" = OrderedDict()
+_http_clients: Dict[Optional[asyncio.AbstractEventLoop], httpx.AsyncClient] = {}
+
+
+def _current_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _drop_closed_loops():
+    """Forget pools and agents of loops that have been closed (their connections went with them)."""
+    for loop in [lp for lp in _http_clients if lp is not None and lp.is_closed()]:
+        del _http_clients[loop]
+    for key in [k for k in _agents if k[-1] is not None and k[-1].is_closed()]:
+        del _agents[key]
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared pooled client for the running event loop."""
+    loop = _current_loop()
+    with _lock:
+        _drop_closed_loops()
+        client = _http_clients.get(loop)
+        if client is None or client.is_closed:
+            client = _http_clients[loop] = httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+        return client
+
+
+def _build_model(model):
+    """'openai:<name>' → OpenAI chat model on the shared pool; anything else passes through."""
+    if isinstance(model, str) and model.startswith("openai:"):
+        from pydantic_ai.models.openai import OpenAIChatModel
+        from pydantic_ai.providers.openai import OpenAIProvider
+
+        provider = OpenAIProvider(http_client=get_http_client())
+        return OpenAIChatModel(model.split(":", 1)[1], provider=provider)
+    return model
+
+
+def _key_fingerprint() -> str:
+    key = os.getenv("OPENAI_API_KEY", "")
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def get_agent(model, output_type: Type[BaseModel], system_prompt: str = "") -> Agent:
+    """Return the shared Agent for this configuration, building it on first use.
+
+    Keyed on the output schema rather than the class object, because Streamlit
+    re-executes the page script (and its class statements) on every rerun.
+    """
+    pooled = isinstance(model, str) and model.startswith("openai:")
+    key = (
+        model if isinstance(model, str) else id(model),
+        output_type.__name__,
+        schema_hash(output_type),
+        system_prompt or "",
+        _key_fingerprint(),
+        _current_loop() if pooled else None,  # OpenAI agents are bound to their loop's pool
+    )
+    with _lock:
+        agent = _agents.get(key)
+        if agent is not None:
+            _agents.move_to_end(key)
+            return agent
+
+    agent = Agent(_build_model(model), output_type=output_type, system_prompt=system_prompt)
+    with _lock:
+        _agents[key] = agent
+        while len(_agents) > MAX_AGENTS:
+            _agents.popitem(last=False)
+    return agent
+
+
+def registry_size() -> int:
+    with _lock:
+        return len(_agents)
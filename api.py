@@ -0,0 +1,163 @@
+"""
+Headless async JSON API for the QR landing flows.
+
+Same catalog and flows layer as PROJECT.py, but each request is a coroutine on
+the server's event loop: an LLM call in flight holds no thread, so one process
+serves many concurrent QR scans. Mobile landings can call it directly.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 2
+
+    GET  /products/{product_id}?page=0          product + one review page
+    GET  /products/{product_id}/summary         precomputed, local or generated ReviewSummary
+    POST /products/{product_id}/chat            {"question": ...}            (?stream=true → NDJSON)
+    POST /products/{product_id}/reviews/translate  {"target_lang": ...}
+    POST /translate                             {"text": ..., "target_lang": ...}  (?stream=true → NDJSON)
+"""
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from pydantic_ai.exceptions import AgentRunError
+
+from catalog import REVIEW_PAGE_SIZE, get_catalog
+from flows import (
+    DEFAULT_PERSONA,
+    gen_chat,
+    gen_translation,
+    get_or_generate_summary,
+    get_precomputed_summary,
+    stream_chat,
+    stream_translation,
+    translate_reviews,
+)
+from request_log import get_logger, log_context
+from schemas import ChatAnswer, ReviewSummary, Translation
+
+
+class ChatRequest(BaseModel):
+    question: str = Field(min_length=1)
+    system_prompt: str = DEFAULT_PERSONA
+
+
+class TranslateRequest(BaseModel):
+    text: str = Field(min_length=1)
+    target_lang: str = "English"
+    system_prompt: str = DEFAULT_PERSONA
+
+
+class ReviewTranslateRequest(BaseModel):
+    target_lang: str = "English"
+    system_prompt: str = DEFAULT_PERSONA
+
+
+class ProductPage(BaseModel):
+    product_id: str
+    product: dict
+    review_count: int
+    duplicates_collapsed: int
+    page: int
+    page_count: int
+    reviews: List[str]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_catalog()  # load products and the review offsets before the first scan
+    yield
+    get_logger().flush()
+
+
+app = FastAPI(title="Olive Young QR landing API", lifespan=lifespan)
+
+
+@app.exception_handler(AgentRunError)
+async def model_error(request, exc: AgentRunError):
+    # Upstream model failures (HTTP errors, bad structured output) are a bad gateway, not a bug here
+    return JSONResponse(status_code=502, content={"detail": f"{type(exc).__name__}: {exc}"})
+
+
+def _product_id(product_id: str) -> str:
+    # Unlike the Streamlit page, unknown ids are an error here, not the fallback product
+    if product_id not in get_catalog():
+        raise HTTPException(status_code=404, detail=f"Unknown product_id: {product_id}")
+    return product_id
+
+
+def _require_key():
+    if not os.getenv("OPENAI_API_KEY"):
+        raise HTTPException(status_code=503, detail="OPENAI_API_KEY is not configured on the server")
+
+
+def _ndjson(agen: AsyncIterator[BaseModel], **log_fields) -> StreamingResponse:
+    """Stream partial outputs as newline-delimited JSON; the last line is final."""
+    async def body():
+        with log_context(**log_fields):
+            async for partial in agen:
+                yield partial.model_dump_json() + "\n"
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"ok": True, "products": len(get_catalog().product_ids)}
+
+
+@app.get("/products/{product_id}", response_model=ProductPage)
+async def product(product_id: str, page: int = Query(0, ge=0)):
+    catalog = get_catalog()
+    pid = _product_id(product_id)
+    return ProductPage(
+        product_id=pid,
+        product=catalog.get(pid),
+        review_count=catalog.review_count(pid),
+        duplicates_collapsed=sum(catalog.duplicates(pid).values()),
+        page=page,
+        page_count=catalog.page_count(pid),
+        reviews=catalog.get_reviews(pid, page=page, page_size=REVIEW_PAGE_SIZE),
+    )
+
+
+@app.get("/products/{product_id}/summary", response_model=ReviewSummary)
+async def summary(product_id: str, system_prompt: Optional[str] = None):
+    pid = _product_id(product_id)
+    productData, reviews = get_catalog().payload(pid)
+    persona = system_prompt or DEFAULT_PERSONA
+    precomputed = get_precomputed_summary(pid, reviews, persona)
+    if precomputed is not None:
+        return precomputed
+    # Without a key the local lexicon summary is served instead of a 503
+    with log_context(product_id=pid):
+        return await get_or_generate_summary(pid, productData, reviews, persona, allow_llm=bool(os.getenv("OPENAI_API_KEY")))
+
+
+@app.post("/products/{product_id}/chat", response_model=ChatAnswer)
+async def chat(product_id: str, req: ChatRequest, stream: bool = False):
+    pid = _product_id(product_id)
+    _require_key()
+    catalog = get_catalog()
+    productData, reviews = catalog.payload(pid)
+    index = catalog.review_index(pid)
+    if stream:
+        return _ndjson(stream_chat(productData, reviews, req.question, req.system_prompt, index), product_id=pid)
+    with log_context(product_id=pid):
+        return await gen_chat(productData, reviews, req.question, req.system_prompt, index)
+
+
+@app.post("/products/{product_id}/reviews/translate", response_model=List[str])
+async def review_translations(product_id: str, req: ReviewTranslateRequest):
+    pid = _product_id(product_id)
+    _require_key()
+    _, reviews = get_catalog().payload(pid)
+    with log_context(product_id=pid):
+        return await translate_reviews(pid, reviews, req.target_lang, req.system_prompt)
+
+
+@app.post("/translate", response_model=Translation)
+async def translate(req: TranslateRequest, stream: bool = False):
+    _require_key()
+    if stream:
+        return _ndjson(stream_translation(req.text, req.target_lang, req.system_prompt))
+    return await gen_translation(req.text, req.target_lang, req.system_prompt)
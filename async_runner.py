@@ -0,0 +1,147 @@
+"""
+One long-lived asyncio event loop per server process, running in a daemon thread.
+
+Streamlit scripts are synchronous, so instead of creating and destroying an
+event loop per click (asyncio.run), coroutines are submitted to this loop.
+Pooled HTTP clients and other async state (agents.py) survive between calls.
+
+    from async_runner import run_async, submit
+    data = run_async(gen_chat(), timeout=60)     # blocking, cancels on timeout
+    fut = submit(gen_chat())                     # concurrent.futures.Future
+    for partial in iterate(stream_chat(...)):    # sync view of an async generator
+        ...
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import queue
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Iterator, Optional
+
+DEFAULT_TIMEOUT = float(os.getenv("OLIVE_ASYNC_TIMEOUT", "120"))
+
+
+class BackgroundLoop:
+    def __init__(self, name: str = "olive-async-loop"):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> "BackgroundLoop":
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._started.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        self._started.wait()
+        return self
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """Schedule a coroutine on the background loop and return its future.
+
+        The task runs in a copy of the caller's contextvars (request-log tags,
+        timing spans), as if the coroutine had been awaited in place.
+        """
+        self.start()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("submit() called from the background loop itself; await the coroutine instead")
+        # The scheduling callback, and the task it creates, inherit the context it runs in
+        return contextvars.copy_context().run(asyncio.run_coroutine_threadsafe, coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = DEFAULT_TIMEOUT) -> Any:
+        """Block until the coroutine finishes; cancel it if it exceeds timeout."""
+        fut = self.submit(coro)
+        try:
+            return fut.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            fut.cancel()
+            raise TimeoutError(f"Async call did not finish within {timeout}s") from None
+        except BaseException:
+            fut.cancel()
+            raise
+
+    def stop(self):
+        with self._lock:
+            if self.loop is not None and self._thread is not None and self._thread.is_alive():
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self._thread.join(timeout=5)
+            self._thread = None
+
+
+_runner: Optional[BackgroundLoop] = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> BackgroundLoop:
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = BackgroundLoop()
+        return _runner.start()
+
+
+def submit(coro: Awaitable) -> concurrent.futures.Future:
+    return get_runner().submit(coro)
+
+
+def run_async(coro: Awaitable, timeout: Optional[float] = DEFAULT_TIMEOUT) -> Any:
+    """Run a coroutine on the shared background loop (drop-in for the old helper)."""
+    return get_runner().run(coro, timeout=timeout)
+
+
+def cancel(fut: concurrent.futures.Future) -> bool:
+    """Cancel a submitted call; the task is cancelled inside the loop too."""
+    return fut.cancel()
+
+
+_DONE = object()
+
+
+def iterate(agen: AsyncIterator, timeout: Optional[float] = DEFAULT_TIMEOUT) -> Iterator:
+    """Consume an async generator on the background loop, yielding items here.
+
+    Lets a synchronous Streamlit script render streamed partial outputs as they
+    arrive. Stopping iteration early (or hitting timeout) cancels the producer.
+    """
+    items: "queue.Queue" = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put((item, None))
+        except Exception as e:
+            items.put((None, e))
+        finally:
+            items.put((_DONE, None))
+
+    fut = submit(pump())
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item, error = items.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError(f"Async stream did not finish within {timeout}s") from None
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        if not fut.done():
+            fut.cancel()
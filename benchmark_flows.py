@@ -0,0 +1,260 @@
+"""
+Offline concurrency benchmark for the QR landing flows (no OpenAI calls).
+
+`openai:gpt-4o-mini` is swapped for a pydantic-ai FunctionModel that sleeps for
+an injected latency and answers with outputs of a configurable size, then the
+summary / translation / chat coroutines are driven by N concurrent simulated
+sessions on one event loop. Prompts are unique per request and the response
+cache, result store, translation memory and request log point at a temp
+directory, so every request really goes through the model path.
+
+    python benchmark_flows.py                                   # 20 sessions x 6 requests
+    python benchmark_flows.py --sessions 100 --latency-ms 400 --stream
+    python benchmark_flows.py --model test                      # TestModel, zero latency
+    python benchmark_flows.py --save-baseline bench.json        # record a baseline
+    python benchmark_flows.py --baseline bench.json             # exit 1 on regression
+    python benchmark_flows.py --max-p95-ms 800 --min-rps 30     # absolute thresholds
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+MODES = ("summary", "translation", "chat")
+_FILLER = "smooth hydrating gentle light texture scent value daily routine".split()
+
+
+def _words(n: int, rng: random.Random) -> str:
+    return " ".join(rng.choice(_FILLER) for _ in range(max(1, n)))
+
+
+def _fake_value(schema: dict, prompt: str, output_tokens: int, rng: random.Random):
+    if "enum" in schema:
+        return schema["enum"][0]
+    if schema.get("type") == "array":
+        # Batched translations must return one item per numbered input
+        numbered = re.findall(r"^(?:\d+\.|\[\d+\]) ", prompt, re.M)
+        n = len(numbered) or 3
+        return [_words(max(1, output_tokens // n), rng) for _ in range(n)]
+    return _words(output_tokens, rng)
+
+
+def build_model(latency_ms: float, jitter_ms: float, output_tokens: int, chunk_tokens: int = 4, seed: int = 0):
+    """FunctionModel stand-in: sleeps latency ± jitter, then returns schema-shaped output."""
+    from pydantic_ai.messages import ModelResponse, ToolCallPart
+    from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+    rng = random.Random(seed)
+
+    def delay() -> float:
+        return max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+
+    def answer(messages, info: AgentInfo):
+        tool = info.output_tools[0]
+        prompt = messages[-1].parts[-1].content
+        props = tool.parameters_json_schema["properties"]
+        return tool.name, {k: _fake_value(v, prompt, output_tokens, rng) for k, v in props.items()}
+
+    async def run(messages, info: AgentInfo):
+        await asyncio.sleep(delay())
+        name, args = answer(messages, info)
+        return ModelResponse(parts=[ToolCallPart(name, args)])
+
+    async def stream(messages, info: AgentInfo):
+        # Latency is time to first token; the rest streams out in small chunks
+        await asyncio.sleep(delay())
+        name, args = answer(messages, info)
+        js = json.dumps(args, ensure_ascii=False)
+        step = max(1, chunk_tokens * 4)
+        for i in range(0, len(js), step):
+            yield {0: DeltaToolCall(name=name if i == 0 else None, json_args=js[i:i + step])}
+            await asyncio.sleep(0)
+
+    return FunctionModel(run, stream_function=stream, model_name="bench")
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(max(values))}
+
+
+async def run_benchmark(
+    sessions: int,
+    requests_per_session: int,
+    modes=MODES,
+    stream: bool = False,
+    reviews_per_product: Optional[int] = None,
+    seed: int = 0,
+) -> dict:
+    import flows
+    from catalog import get_catalog
+
+    catalog = get_catalog()
+    rng = random.Random(seed)
+    product_ids = catalog.product_ids
+    latencies: Dict[str, List[float]] = {m: [] for m in modes}
+    first_partial: Dict[str, List[float]] = {m: [] for m in modes}
+    errors: Dict[str, int] = {m: 0 for m in modes}
+
+    async def one(session: int, i: int, mode: str):
+        pid = product_ids[(session + i) % len(product_ids)]
+        productData, reviews = catalog.payload(pid)
+        if reviews_per_product:
+            reviews = [f"{reviews[j % len(reviews)] if reviews else _words(40, rng)} ({j})" for j in range(reviews_per_product)]
+        tag = f"s{session}-r{i}"  # unique prompt → no cache hits
+        t0 = time.perf_counter()
+        ttft = None
+        try:
+            if mode == "summary":
+                await flows.gen_review_summary(dict(productData, name=f"{productData.get('name', '')} {tag}"), reviews)
+            elif mode == "translation":
+                text = f"Order {tag} ships tomorrow. The toner is gentle on dry skin!"
+                if stream:
+                    async for _ in flows.stream_translation(text, "Korean"):
+                        ttft = ttft or time.perf_counter() - t0
+                else:
+                    await flows.gen_translation(text, "Korean")
+            else:
+                question = f"Is this okay for sensitive skin? ({tag})"
+                if stream:
+                    async for _ in flows.stream_chat(productData, reviews, question):
+                        ttft = ttft or time.perf_counter() - t0
+                else:
+                    await flows.gen_chat(productData, reviews, question, index=catalog.review_index(pid))
+        except Exception as e:
+            errors[mode] += 1
+            print(f"[error] {mode} {tag}: {type(e).__name__}: {e}", file=sys.stderr)
+            return
+        latencies[mode].append((time.perf_counter() - t0) * 1000)
+        if ttft is not None:
+            first_partial[mode].append(ttft * 1000)
+
+    async def session_loop(session: int):
+        for i in range(requests_per_session):
+            await one(session, i, modes[(session + i) % len(modes)])
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(session_loop(s) for s in range(sessions)))
+    wall = time.perf_counter() - t0
+
+    done = sum(len(v) for v in latencies.values())
+    report = {
+        "sessions": sessions,
+        "requests": done,
+        "errors": sum(errors.values()),
+        "wall_s": wall,
+        "rps": done / wall if wall > 0 else 0.0,
+        "all": percentiles([x for v in latencies.values() for x in v]),
+        "modes": {m: dict(percentiles(latencies[m]), n=len(latencies[m]), errors=errors[m]) for m in modes},
+    }
+    if stream:
+        report["first_partial"] = {m: percentiles(v) for m, v in first_partial.items() if v}
+    return report
+
+
+def check_regressions(report: dict, baseline: Optional[dict], tolerance: float,
+                      max_p95_ms: Optional[float], min_rps: Optional[float]) -> List[str]:
+    failures = []
+    if report["errors"]:
+        failures.append(f"{report['errors']} requests failed")
+    if max_p95_ms is not None and report["all"]["p95"] > max_p95_ms:
+        failures.append(f"p95 {report['all']['p95']:.0f} ms > {max_p95_ms:.0f} ms")
+    if min_rps is not None and report["rps"] < min_rps:
+        failures.append(f"throughput {report['rps']:.1f} req/s < {min_rps:.1f} req/s")
+    if baseline:
+        if report["rps"] < baseline["rps"] * (1 - tolerance):
+            failures.append(f"throughput {report['rps']:.1f} req/s vs baseline {baseline['rps']:.1f} (-{tolerance:.0%} allowed)")
+        for m, stats in report["modes"].items():
+            base = baseline.get("modes", {}).get(m)
+            if base and stats["n"] and stats["p95"] > base["p95"] * (1 + tolerance):
+                failures.append(f"{m} p95 {stats['p95']:.0f} ms vs baseline {base['p95']:.0f} ms (+{tolerance:.0%} allowed)")
+    return failures
+
+
+def format_report(report: dict, latency_ms: float) -> str:
+    lines = [
+        f"{report['sessions']} sessions · {report['requests']} requests · {report['errors']} errors · "
+        f"{report['wall_s']:.2f}s wall · {report['rps']:.1f} req/s",
+        f"{'mode':<14}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'overhead p50':>15}",
+    ]
+    rows = list(report["modes"].items()) + [("all", dict(report["all"], n=report["requests"]))]
+    for m, s in rows:
+        lines.append(
+            f"{m:<14}{s['n']:>6}{s['p50']:>9.1f}{s['p95']:>9.1f}{s['p99']:>9.1f}{s['max']:>9.1f}"
+            f"{s['p50'] - latency_ms:>15.1f}"
+        )
+    for m, s in report.get("first_partial", {}).items():
+        lines.append(f"first partial {m:<11} p50 {s['p50']:.1f} ms · p95 {s['p95']:.1f} ms")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent simulated shoppers")
+    parser.add_argument("--requests", type=int, default=6, help="requests per session (modes rotate)")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--model", choices=["function", "test"], default="function")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="injected model latency")
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--output-tokens", type=int, default=60, help="approx. size of each text field")
+    parser.add_argument("--reviews", type=int, default=None, help="synthetic reviews per product (exercises map-reduce)")
+    parser.add_argument("--stream", action="store_true", help="use the streaming translation / chat flows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH", help="fail if slower than this saved report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression vs baseline (0.2 = 20%%)")
+    parser.add_argument("--max-p95-ms", type=float, default=None)
+    parser.add_argument("--min-rps", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    # Isolate every store before the flows modules read their default paths
+    tmp = tempfile.mkdtemp(prefix="olive-bench-")
+    os.environ["OLIVE_LLM_CACHE"] = os.path.join(tmp, "llm_cache.sqlite3")
+    os.environ["OLIVE_RESULT_STORE"] = os.path.join(tmp, "results.sqlite3")
+    os.environ["OLIVE_REQUEST_LOG"] = os.path.join(tmp, "requests.jsonl")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+    import flows
+
+    if args.model == "test":
+        from pydantic_ai.models.test import TestModel
+        flows.MODEL_NAME = TestModel()
+        latency = 0.0
+    else:
+        flows.MODEL_NAME = build_model(args.latency_ms, args.jitter_ms, args.output_tokens, seed=args.seed)
+        latency = args.latency_ms
+
+    modes = tuple(m.strip() for m in args.modes.split(",") if m.strip() in MODES)
+    report = asyncio.run(run_benchmark(args.sessions, args.requests, modes, args.stream, args.reviews, args.seed))
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("json", "save_baseline", "baseline")}
+
+    print(json.dumps(report, indent=2) if args.json else format_report(report, latency))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    failures = check_regressions(report, baseline, args.tolerance, args.max_p95_ms, args.min_rps)
+    for msg in failures:
+        print(f"[regression] {msg}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
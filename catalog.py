@@ -0,0 +1,191 @@
+"""
+Indexed product catalog (replaces the hard-coded n8n-like if/elif chain).
+
+- data/products.json : {product_id: productData}
+- data/reviews.jsonl : one {"product_id", "text"} record per line
+
+Products are loaded once into a dict (O(1) lookup by product_id). For reviews
+only the byte offsets are indexed at load time; review text is read lazily,
+page by page, so memory stays flat with tens of thousands of SKUs.
+
+Duplicate reviews are collapsed after the offsets are indexed: exact or near
+copies of an earlier review, under the same product or (for reviews longer
+than a few words) another one, are left out of the product's review list. They never reach the card, the BM25 index or
+a prompt; duplicates(product_id) says where the first copies live. The
+duplicate map comes from data/review_duplicates.json (review_dedup.py), which
+matches the reviews file by size and SHA-256; it is only rebuilt (and saved
+again) when the reviews file changed, so a normal start just hashes the file.
+"""
+import hashlib
+import json
+import os
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from review_dedup import build_duplicate_map, load_duplicate_map, save_duplicate_map
+from review_index import ReviewIndex
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+PRODUCTS_PATH = os.getenv("OLIVE_PRODUCTS_PATH", os.path.join(DATA_DIR, "products.json"))
+REVIEWS_PATH = os.getenv("OLIVE_REVIEWS_PATH", os.path.join(DATA_DIR, "reviews.jsonl"))
+
+# Unknown product_ids fall back to this product (same as the old `else:` branch)
+FALLBACK_PRODUCT_ID = "4"
+REVIEW_PAGE_SIZE = 5
+
+
+class Catalog:
+    def __init__(self, products: Dict[str, dict], reviews_path: str, fallback_id: str = FALLBACK_PRODUCT_ID,
+                 dedupe: bool = True):
+        self.products = products
+        self.product_ids: List[str] = list(products)
+        self.reviews_path = reviews_path
+        self.fallback_id = fallback_id if fallback_id in products else (self.product_ids[0] if products else None)
+        self._offsets: Dict[str, array] = {}
+        self._duplicates: Dict[str, List[str]] = {}  # product → product of each collapsed copy's first copy
+        self.collapsed_offsets: FrozenSet[int] = frozenset()  # byte offsets of the collapsed copies
+        self.dedupe = dedupe
+        self._pages: "OrderedDict[tuple, List[str]]" = OrderedDict()
+        self._max_pages = 256
+        self._indexes: "OrderedDict[str, ReviewIndex]" = OrderedDict()
+        self._max_indexes = 512
+        self._lock = threading.Lock()
+        self._index_reviews()
+
+    @classmethod
+    def load(cls, products_path: str = PRODUCTS_PATH, reviews_path: str = REVIEWS_PATH) -> "Catalog":
+        with open(products_path, encoding="utf-8") as f:
+            products = {str(k): v for k, v in json.load(f).items()}
+        return cls(products, reviews_path)
+
+    def _index_reviews(self):
+        if not os.path.exists(self.reviews_path):
+            return
+        sha = hashlib.sha256()
+        with open(self.reviews_path, "rb") as f:
+            offset = f.tell()
+            for line in iter(f.readline, b""):
+                sha.update(line)
+                if line.strip():
+                    pid = str(json.loads(line)["product_id"])
+                    self._offsets.setdefault(pid, array("q")).append(offset)
+                offset = f.tell()
+        if self.dedupe:
+            self._collapse_duplicates(offset, sha.hexdigest())
+
+    def _collapse_duplicates(self, size: int, sha256: str):
+        duplicates = load_duplicate_map(size, sha256)
+        if duplicates is None:
+            duplicates, size, sha256 = build_duplicate_map(self.reviews_path)
+            try:
+                save_duplicate_map(duplicates, size, sha256)
+            except OSError:
+                pass  # read-only checkout: rebuilt again on the next start
+        if not duplicates:
+            return
+        self.collapsed_offsets = frozenset(duplicates)
+        firsts = set(duplicates.values())
+        owner = {off: pid for pid, offsets in self._offsets.items() for off in offsets if off in firsts}
+        for pid, offsets in list(self._offsets.items()):
+            kept = array("q", (off for off in offsets if off not in duplicates))
+            if len(kept) == len(offsets):
+                continue
+            self._duplicates[pid] = [owner[duplicates[off]] for off in offsets if off in duplicates]
+            if kept:
+                self._offsets[pid] = kept
+            else:
+                del self._offsets[pid]
+
+    # --------------------------------------------------------------------------
+    # Products
+    # --------------------------------------------------------------------------
+    def resolve(self, product_id) -> Optional[str]:
+        pid = str(product_id)
+        return pid if pid in self.products else self.fallback_id
+
+    def get(self, product_id) -> dict:
+        pid = self.resolve(product_id)
+        return self.products.get(pid, {}) if pid is not None else {}
+
+    def __contains__(self, product_id) -> bool:
+        return str(product_id) in self.products
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    # --------------------------------------------------------------------------
+    # Reviews (lazy + paginated)
+    # --------------------------------------------------------------------------
+    def review_count(self, product_id) -> int:
+        return len(self._offsets.get(self.resolve(product_id), ()))
+
+    def duplicates(self, product_id) -> Counter:
+        """Collapsed duplicate reviews of a product, counted by the product holding the first copy."""
+        return Counter(self._duplicates.get(self.resolve(product_id), ()))
+
+    def page_count(self, product_id, page_size: int = REVIEW_PAGE_SIZE) -> int:
+        return max(1, -(-self.review_count(product_id) // page_size))
+
+    def get_reviews(self, product_id, page: int = 0, page_size: Optional[int] = REVIEW_PAGE_SIZE) -> List[str]:
+        """One page of review texts; page_size=None returns every review."""
+        pid = self.resolve(product_id)
+        offsets = self._offsets.get(pid)
+        if not offsets:
+            return []
+
+        key = (pid, page, page_size)
+        with self._lock:
+            if key in self._pages:
+                self._pages.move_to_end(key)
+                return self._pages[key]
+        texts = self._read(offsets if page_size is None else offsets[page * page_size:(page + 1) * page_size])
+        with self._lock:
+            self._pages[key] = texts
+            if len(self._pages) > self._max_pages:
+                self._pages.popitem(last=False)
+        return texts
+
+    def _read(self, offsets) -> List[str]:
+        texts = []
+        with open(self.reviews_path, "rb") as f:
+            for off in offsets:
+                f.seek(off)
+                texts.append(json.loads(f.readline())["text"])
+        return texts
+
+    def review_index(self, product_id) -> ReviewIndex:
+        """BM25 index over a product's reviews, built once per process and product."""
+        pid = self.resolve(product_id)
+        with self._lock:
+            if pid in self._indexes:
+                self._indexes.move_to_end(pid)
+                return self._indexes[pid]
+        index = ReviewIndex(self.get_reviews(pid, page_size=None))
+        with self._lock:
+            self._indexes[pid] = index
+            if len(self._indexes) > self._max_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+    def payload(self, product_id) -> Tuple[dict, List[str]]:
+        """(productData, all reviews) — same shape as the old get_product_payload."""
+        return self.get(product_id), self.get_reviews(product_id, page_size=None)
+
+
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """Process-wide catalog (PROJECT.py wraps this in st.cache_resource)."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = Catalog.load()
+        return _catalog
+
+
+def get_product_payload(product_id: str):
+    return get_catalog().payload(product_id)
@@ -0,0 +1,103 @@
+"""
+BM25 search over policy documents with a prebuilt inverted index.
+
+Used by week09's `search_policies` tool. Documents are split into paragraphs
+and tokenized once when added; a query then only touches the postings of its
+own terms instead of scanning every paragraph. Documents can be added and
+removed incrementally as the policy corpus grows.
+
+    index = DocumentIndex()
+    index.add_document("Brand Guide", BRAND_GUIDE)
+    index.search_text("hoodie price")
+"""
+import math
+from typing import Dict, List, NamedTuple
+
+from tokens import tokenize
+
+
+class Hit(NamedTuple):
+    doc: str
+    passage: str
+    score: float
+
+
+class DocumentIndex:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}   # term → {passage_id: tf}
+        self._passages: Dict[int, tuple] = {}            # passage_id → (doc, text, length)
+        self._docs: Dict[str, List[int]] = {}            # doc → passage_ids
+        self._next_id = 0
+        self._total_len = 0
+
+    @staticmethod
+    def split_passages(text: str) -> List[str]:
+        return [p.strip() for p in text.strip().split("\n\n") if p.strip()]
+
+    def add_document(self, name: str, text: str) -> int:
+        """Index a document (replacing any previous version). Returns #passages."""
+        if name in self._docs:
+            self.remove_document(name)
+        ids = []
+        for passage in self.split_passages(text):
+            terms = tokenize(passage)
+            pid = self._next_id
+            self._next_id += 1
+            self._passages[pid] = (name, passage, len(terms))
+            self._total_len += len(terms)
+            for t in terms:
+                row = self._postings.setdefault(t, {})
+                row[pid] = row.get(pid, 0) + 1
+            ids.append(pid)
+        self._docs[name] = ids
+        return len(ids)
+
+    def remove_document(self, name: str) -> bool:
+        ids = self._docs.pop(name, None)
+        if ids is None:
+            return False
+        for pid in ids:
+            _, passage, length = self._passages.pop(pid)
+            self._total_len -= length
+            for t in set(tokenize(passage)):
+                row = self._postings.get(t)
+                if row is not None:
+                    row.pop(pid, None)
+                    if not row:
+                        del self._postings[t]
+        return True
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @property
+    def documents(self) -> List[str]:
+        return list(self._docs)
+
+    def search(self, query: str, k: int = 3) -> List[Hit]:
+        """Top-k passages ranked by BM25."""
+        n = len(self._passages)
+        if not n:
+            return []
+        avgdl = (self._total_len / n) or 1.0
+        scores: Dict[int, float] = {}
+        for t in set(tokenize(query)):
+            row = self._postings.get(t)
+            if not row:
+                continue
+            idf = math.log(1 + (n - len(row) + 0.5) / (len(row) + 0.5))
+            for pid, tf in row.items():
+                length = self._passages[pid][2]
+                denom = tf + self.k1 * (1 - self.b + self.b * length / avgdl)
+                scores[pid] = scores.get(pid, 0.0) + idf * tf * (self.k1 + 1) / denom
+        best = sorted(scores.items(), key=lambda kv: -kv[1])[:k]
+        return [Hit(self._passages[pid][0], self._passages[pid][1], score) for pid, score in best]
+
+    def search_text(self, query: str, k: int = 3) -> str:
+        """Tool-friendly string: '[Doc] passage' blocks, best match first."""
+        hits = self.search(query, k)
+        if hits:
+            return "\n\n".join(f"[{h.doc}] {h.passage}" for h in hits)
+        return "No relevant information found."
@@ -0,0 +1,449 @@
+"""
+Prompt building and agent calls for the QR landing flows.
+
+Kept free of Streamlit so the same code runs from PROJECT.py and from
+offline jobs such as precompute_summaries.py.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from llm_cache import run_cached, schema_hash, stream_cached
+from prompt_budget import Packed, pack_reviews
+from request_log import logged_as
+from result_store import fingerprint, get_store
+from review_index import ReviewIndex
+from review_sentiment import local_summary
+from schemas import ChatAnswer, ReviewSummary, ReviewTranslations, SegmentTranslations, StreamingChatAnswer, Translation
+from timing import span
+from tokens import chunk_by_tokens, estimate_tokens, truncate_to_tokens
+from translation_memory import get_memory
+
+MODEL_NAME = "openai:gpt-4o-mini"
+SUMMARY_NAMESPACE = "review_summaries"
+
+# Map-reduce summarizer: reviews per map call and parallel calls per product
+SUMMARY_CHUNK_TOKENS = 3000
+SUMMARY_MAX_CONCURRENCY = 8
+# Review budget per summary (one parallel wave of map calls); past it the least
+# informative reviews are dropped, so cost stops growing with the review count
+SUMMARY_REVIEW_TOKENS = SUMMARY_CHUNK_TOKENS * SUMMARY_MAX_CONCURRENCY
+SUMMARY_ITEM_TOKENS = 500
+
+# Whole-product review translation: one batched call per chunk of reviews
+REVIEW_TRANSLATION_NAMESPACE = "review_translations"
+REVIEW_TRANSLATION_CHUNK_TOKENS = 3000
+
+# Chatbot retrieval: only the top-k reviews relevant to the question go in the prompt
+CHAT_TOP_K = 8
+CHAT_CANDIDATES = 32  # BM25 hits considered before packing
+CHAT_REVIEW_TOKENS = 1200
+CHAT_QUESTION_TOKENS = 300
+# Streamed answers that come back without a safety note get this one
+DEFAULT_SAFETY_NOTE = "Patch test on a small area first, especially if your skin is sensitive."
+
+DEFAULT_PERSONA = (
+    "You are an Olive Young in-store assistant. "
+    "Be concise, neutral, and practical. Avoid exaggerated marketing."
+)
+
+
+# ==============================================================================
+# 1) Review Summary
+# ==============================================================================
+def build_summary_prompt(productData: dict, reviews: list) -> str:
+    return f"""
+Summarize customer reviews for this product.
+
+Product: {productData.get("name")}
+Reviews:
+{chr(10).join(reviews)}
+
+Rules:
+- pros/cons max 3 each
+- neutral, practical tone
+"""
+
+
+def build_reduce_prompt(productData: dict, partials: list) -> str:
+    blocks = [
+        f"""[Batch {i + 1} · {p.overall_sentiment}]
+One-line: {p.one_line_summary}
+Pros: {"; ".join(p.pros)}
+Cons: {"; ".join(p.cons)}"""
+        for i, p in enumerate(partials)
+    ]
+    return f"""
+Merge partial review summaries into one summary for this product.
+Each batch summarizes a different slice of the customer reviews.
+
+Product: {productData.get("name")}
+
+{(chr(10) * 2).join(blocks)}
+
+Rules:
+- overall_sentiment reflects all batches (use "mixed" when they disagree)
+- merge duplicates; pros/cons max 3 each, most frequently mentioned first
+- neutral, practical tone
+"""
+
+
+@logged_as("summary")
+async def gen_review_summary(productData: dict, reviews: list, system_prompt: str = DEFAULT_PERSONA) -> ReviewSummary:
+    """Single call for small review sets; hierarchical map-reduce for large ones.
+
+    Reviews are split into token-bounded chunks, each chunk is summarized in
+    parallel (bounded by SUMMARY_MAX_CONCURRENCY), then partial summaries are
+    merged group by group until one remains. Depth grows with log(#reviews).
+    """
+    with span("pack", reviews=len(reviews)) as s:
+        packed = pack_reviews(reviews, SUMMARY_REVIEW_TOKENS, max_item_tokens=SUMMARY_ITEM_TOKENS, keep_order=True)
+        s.attrs.update(packed.report())
+    with span("chunk"):
+        chunks = chunk_by_tokens(packed.items, SUMMARY_CHUNK_TOKENS)
+    if len(chunks) <= 1:
+        with span("prompt_build") as s:
+            prompt = build_summary_prompt(productData, packed.items)
+            s.attrs["prompt_tokens"] = estimate_tokens(prompt)
+        return await run_cached(MODEL_NAME, ReviewSummary, system_prompt, prompt)
+
+    sem = asyncio.Semaphore(SUMMARY_MAX_CONCURRENCY)
+
+    async def call(prompt: str) -> ReviewSummary:
+        async with sem:
+            return await run_cached(MODEL_NAME, ReviewSummary, system_prompt, prompt)
+
+    with span("map", chunks=len(chunks)):
+        partials = await asyncio.gather(*(call(build_summary_prompt(productData, c)) for c in chunks))
+    while len(partials) > 1:
+        groups = _reduce_groups(productData, list(partials))
+        with span("reduce", groups=len(groups)):
+            partials = await asyncio.gather(*(call(build_reduce_prompt(productData, g)) for g in groups))
+    return partials[0]
+
+
+def _reduce_groups(productData: dict, partials: list) -> list:
+    """Group partial summaries so each reduce prompt fits one chunk (min 2 per group)."""
+    groups, current = [], []
+    for p in partials:
+        if len(current) >= 2 and estimate_tokens(build_reduce_prompt(productData, current + [p])) > SUMMARY_CHUNK_TOKENS:
+            groups.append(current)
+            current = []
+        current.append(p)
+    if len(current) == 1 and groups:
+        groups[-1].append(current[0])
+    elif current:
+        groups.append(current)
+    return groups
+
+
+def summary_fingerprint(reviews: list, system_prompt: str = DEFAULT_PERSONA) -> str:
+    """Changes whenever the review set, persona, model or output schema changes."""
+    return fingerprint(list(reviews), system_prompt, MODEL_NAME, schema_hash(ReviewSummary))
+
+
+def get_precomputed_summary(product_id: str, reviews: list, system_prompt: str = DEFAULT_PERSONA) -> Optional[ReviewSummary]:
+    """Summary from the offline store, or None if missing or stale."""
+    raw = get_store(SUMMARY_NAMESPACE).get(str(product_id), summary_fingerprint(reviews, system_prompt))
+    return ReviewSummary.model_validate_json(raw) if raw else None
+
+
+async def get_or_generate_summary(
+    product_id: str,
+    productData: dict,
+    reviews: list,
+    system_prompt: str = DEFAULT_PERSONA,
+    allow_llm: bool = True,
+) -> ReviewSummary:
+    """Tiered: precomputed summary → local lexicon summary → model call.
+
+    The local summary (review_sentiment.py) is served when it is confident,
+    and whatever its confidence when allow_llm is False (no API key). Only
+    model summaries are written to the store.
+    """
+    with span("store_lookup"):
+        cached = get_precomputed_summary(product_id, reviews, system_prompt)
+    if cached is not None:
+        return cached
+    with span("local_summary") as s:
+        local = local_summary(reviews)
+        s.attrs.update(local.stats(), escalate=not local.confident)
+    if local.confident or not allow_llm:
+        return local.summary
+    summary = await gen_review_summary(productData, reviews, system_prompt)
+    get_store(SUMMARY_NAMESPACE).put(
+        str(product_id), summary_fingerprint(reviews, system_prompt), summary.model_dump_json()
+    )
+    return summary
+
+
+# ==============================================================================
+# 2) Translation
+# ==============================================================================
+def build_translation_prompt(text: str, target_lang: str) -> str:
+    return f"""
+Translate the following text to {target_lang}.
+
+Text:
+{text}
+"""
+
+
+def build_segment_prompt(segments: list, target_lang: str) -> str:
+    numbered = "\n".join(f"{i + 1}. {seg}" for i, seg in enumerate(segments))
+    return f"""
+Translate each numbered segment to {target_lang}.
+Return one translation per segment ({len(segments)} in total), in the same order, without the numbers.
+
+Segments:
+{numbered}
+"""
+
+
+@logged_as("translation")
+async def gen_translation(text: str, target_lang: str, system_prompt: str = DEFAULT_PERSONA) -> Translation:
+    """Translate via the translation memory: only unseen sentences reach the model.
+
+    Missing sentences are sent together in one structured call. If the model
+    returns the wrong number of segments, the whole text is translated in a
+    single call instead (and not written to memory).
+    """
+    memory = get_memory()
+    with span("tm_lookup") as s:
+        plan = memory.plan(text, target_lang)
+        s.attrs.update(segments=len(plan.segments), missing=len(plan.missing))
+    if not plan.missing:
+        return Translation(translated_text=plan.assemble())
+
+    with span("prompt_build"):
+        prompt = build_segment_prompt(plan.missing, target_lang)
+    r = await run_cached(MODEL_NAME, SegmentTranslations, system_prompt, prompt)
+    if len(r.translations) != len(plan.missing):
+        prompt = build_translation_prompt(text, target_lang)
+        return await run_cached(MODEL_NAME, Translation, system_prompt, prompt)
+    with span("tm_store"):
+        memory.add(target_lang, plan.missing, r.translations)
+    return Translation(translated_text=plan.assemble(r.translations))
+
+
+@logged_as("translation")
+async def stream_translation(text: str, target_lang: str, system_prompt: str = DEFAULT_PERSONA):
+    """Partial Translation objects as segments arrive (last one is final).
+
+    Nothing is yielded until some segment is translated: sentences already in
+    the translation memory show up immediately, the rest fill in as the
+    batched call streams (partials only contain translated sentences, never
+    source text). If the model returns the wrong number of segments,
+    the whole text is streamed again in a single call (as in gen_translation).
+    """
+    memory = get_memory()
+    with span("tm_lookup") as s:
+        plan = memory.plan(text, target_lang)
+        s.attrs.update(segments=len(plan.segments), missing=len(plan.missing))
+    if plan.known or not plan.missing:
+        yield Translation(translated_text=plan.assemble())
+    if not plan.missing:
+        return
+
+    final = None
+    prompt = build_segment_prompt(plan.missing, target_lang)
+    async for partial in stream_cached(MODEL_NAME, SegmentTranslations, system_prompt, prompt):
+        final = partial
+        if any(t.strip() for t in partial.translations):
+            yield Translation(translated_text=plan.assemble(partial.translations))
+    if final is None or len(final.translations) != len(plan.missing):
+        prompt = build_translation_prompt(text, target_lang)
+        async for partial in stream_cached(MODEL_NAME, Translation, system_prompt, prompt):
+            if partial.translated_text.strip():
+                yield partial
+        return
+    with span("tm_store"):
+        memory.add(target_lang, plan.missing, final.translations)
+
+
+def build_review_translation_prompt(reviews: list, target_lang: str) -> str:
+    numbered = "\n".join(f"[{i + 1}] {' '.join(rv.split())}" for i, rv in enumerate(reviews))
+    return f"""
+Translate each numbered customer review to {target_lang}.
+Return one translation per review ({len(reviews)} in total), in the same order, without the [n] markers.
+
+Reviews:
+{numbered}
+"""
+
+
+def review_translation_fingerprint(reviews: list, target_lang: str) -> str:
+    return fingerprint(list(reviews), target_lang, MODEL_NAME, schema_hash(ReviewTranslations))
+
+
+def get_stored_review_translations(product_id: str, reviews: list, target_lang: str) -> Optional[list]:
+    """Translated review list for (product_id, target_lang, reviews hash), or None."""
+    key = f"{product_id}:{target_lang}"
+    raw = get_store(REVIEW_TRANSLATION_NAMESPACE).get(key, review_translation_fingerprint(reviews, target_lang))
+    return ReviewTranslations.model_validate_json(raw).translated_reviews if raw else None
+
+
+@logged_as("review_translation")
+async def translate_reviews(product_id: str, reviews: list, target_lang: str, system_prompt: str = DEFAULT_PERSONA) -> list:
+    """All reviews of a product in target_lang, batched into as few calls as fit the budget.
+
+    Stored per (product_id, target_lang, reviews hash); re-rendering the
+    review list afterwards needs no model calls. A batch that comes back with
+    the wrong number of translations is asked again once, then split in two.
+    """
+    stored = get_stored_review_translations(product_id, reviews, target_lang)
+    if stored is not None:
+        return stored
+
+    async def batch(chunk: list, retries: int = 1) -> list:
+        def check(r: ReviewTranslations):
+            if len(r.translated_reviews) != len(chunk):
+                raise ValueError(f"Expected {len(chunk)} translated reviews, got {len(r.translated_reviews)}")
+
+        prompt = build_review_translation_prompt(chunk, target_lang)
+        try:
+            r = await run_cached(MODEL_NAME, ReviewTranslations, system_prompt, prompt, check=check)
+        except ValueError:
+            # Wrong count (never cached): ask once more, then split the chunk in halves
+            if retries:
+                return await batch(chunk, retries - 1)
+            if len(chunk) == 1:
+                raise
+            mid = len(chunk) // 2
+            first, second = await asyncio.gather(batch(chunk[:mid]), batch(chunk[mid:]))
+            return first + second
+        return r.translated_reviews
+
+    chunks = chunk_by_tokens(reviews, REVIEW_TRANSLATION_CHUNK_TOKENS)
+    translated = [t for part in await asyncio.gather(*(batch(c) for c in chunks)) for t in part]
+    get_store(REVIEW_TRANSLATION_NAMESPACE).put(
+        f"{product_id}:{target_lang}",
+        review_translation_fingerprint(reviews, target_lang),
+        ReviewTranslations(translated_reviews=translated).model_dump_json(),
+    )
+    return translated
+
+
+# ==============================================================================
+# 3) Chatbot
+# ==============================================================================
+def build_chat_prompt(productData: dict, reviews: list, user_question: str) -> str:
+    return f"""
+You are an in-store assistant. Answer the customer's question using only the product info and reviews below.
+
+Product info:
+{productData}
+
+Reviews:
+{reviews}
+
+Customer question:
+{user_question}
+
+Rules:
+- If uncertain, say what's missing briefly
+- Include a short safety_note (patch test/irritation caution when relevant)
+"""
+
+
+def relevant_reviews(reviews: list, user_question: str, index: Optional[ReviewIndex] = None) -> Packed:
+    """Reviews worth sending for this question, packed into CHAT_REVIEW_TOKENS.
+
+    BM25 hits are ranked by relevance with near-repeats pushed down; when
+    nothing matches, the most informative of the first CHAT_CANDIDATES reviews
+    are used instead. kept/dropped index into reviews.
+    """
+    if index is None:
+        index = ReviewIndex(reviews)
+    hits = index.search(user_question, k=CHAT_CANDIDATES)
+    ids = [i for i, _ in hits] or list(range(min(CHAT_CANDIDATES, len(index))))
+    packed = pack_reviews(
+        [index.reviews[i] for i in ids],
+        CHAT_REVIEW_TOKENS,
+        relevance=[score for _, score in hits] if hits else None,
+        max_items=CHAT_TOP_K,
+        max_item_tokens=CHAT_REVIEW_TOKENS // 2,
+    )
+    packed.kept = [ids[i] for i in packed.kept]
+    kept = set(packed.kept)
+    packed.dropped = [i for i in range(len(index)) if i not in kept]
+    return packed
+
+
+def _chat_prompt(productData: dict, reviews: list, user_question: str, index: Optional[ReviewIndex]) -> str:
+    with span("retrieve") as s:
+        packed = relevant_reviews(reviews, user_question, index)
+        s.attrs.update(reviews=len(reviews), **packed.report())
+    with span("prompt_build") as s:
+        question = truncate_to_tokens(user_question, CHAT_QUESTION_TOKENS)
+        prompt = build_chat_prompt(productData, packed.items, question)
+        s.attrs["prompt_tokens"] = estimate_tokens(prompt)
+    return prompt
+
+
+@logged_as("chat")
+async def gen_chat(
+    productData: dict,
+    reviews: list,
+    user_question: str,
+    system_prompt: str = DEFAULT_PERSONA,
+    index: Optional[ReviewIndex] = None,
+) -> ChatAnswer:
+    prompt = _chat_prompt(productData, reviews, user_question, index)
+    return await run_cached(MODEL_NAME, ChatAnswer, system_prompt, prompt)
+
+
+@logged_as("chat")
+async def stream_chat(
+    productData: dict,
+    reviews: list,
+    user_question: str,
+    system_prompt: str = DEFAULT_PERSONA,
+    index: Optional[ReviewIndex] = None,
+):
+    """Partial answers as tokens arrive; the last one is the final ChatAnswer.
+
+    The streamed schema can't require safety_note (partials would not validate
+    until the model reached it), so an empty note is filled in at the end.
+    """
+    prompt = _chat_prompt(productData, reviews, user_question, index)
+    final = None
+    async for final in stream_cached(MODEL_NAME, StreamingChatAnswer, system_prompt, prompt):
+        yield final
+    if final is not None:
+        yield ChatAnswer(answer=final.answer, safety_note=final.safety_note.strip() or DEFAULT_SAFETY_NOTE)
+
+
+# ==============================================================================
+# Run all (concurrent)
+# ==============================================================================
+@dataclass
+class TaskResult:
+    name: str
+    output: Any = None
+    error: Optional[BaseException] = None
+    seconds: float = 0.0
+
+
+async def _timed(name: str, coro, on_done: Optional[Callable[[TaskResult], None]]) -> TaskResult:
+    t0 = time.perf_counter()
+    try:
+        with span(name):
+            item = TaskResult(name, output=await coro)
+    except Exception as e:
+        item = TaskResult(name, error=e)
+    item.seconds = time.perf_counter() - t0
+    if on_done is not None:
+        on_done(item)
+    return item
+
+
+async def run_all(tasks: Dict[str, Any], on_done: Optional[Callable[[TaskResult], None]] = None) -> List[TaskResult]:
+    """Run the given coroutines concurrently with asyncio.gather.
+
+    on_done is called as each one finishes (e.g. queue.Queue.put, so a
+    Streamlit script thread can render each card as soon as it arrives).
+    Failures are captured per task instead of cancelling the others.
+    """
+    return await asyncio.gather(*(_timed(name, coro, on_done) for name, coro in tasks.items()))
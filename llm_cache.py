@@ -0,0 +1,330 @@
+"""
+Disk-backed response cache for pydantic-ai agent calls.
+
+Entries live in one SQLite file so every Streamlit session and every server
+process on the box shares them. Keys are content hashes of
+(model, system_prompt, rendered prompt, output schema), values are the
+validated output serialized as JSON.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from rate_limit import call_limited, stream_slot
+from request_log import record_call, usage_of
+from timing import annotate, span
+from tokens import estimate_tokens
+
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "OLIVE_LLM_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "llm_cache.sqlite3"),
+)
+DEFAULT_MAX_ENTRIES = int(os.getenv("OLIVE_LLM_CACHE_MAX_ENTRIES", "5000"))
+DEFAULT_TTL_SECONDS = int(os.getenv("OLIVE_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+STREAM_DEBOUNCE_SECONDS = 0.05
+
+
+# ==============================================================================
+# KEYS
+# ==============================================================================
+@functools.lru_cache(maxsize=512)
+def schema_hash(output_type: Type[BaseModel]) -> str:
+    """Hash of the output model's JSON schema (field changes invalidate entries)."""
+    schema = json.dumps(output_type.model_json_schema(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()
+
+
+def make_key(model: str, system_prompt: str, prompt: str, output_type: Type[BaseModel]) -> str:
+    payload = json.dumps(
+        [str(model), system_prompt or "", prompt, schema_hash(output_type)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ==============================================================================
+# CACHE
+# ==============================================================================
+class ResponseCache:
+    """SQLite cache with LRU size limit, TTL eviction and hit/miss counters."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _bump(self, name: str):
+        self._conn.execute(
+            "INSERT INTO counters(name, value) VALUES(?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._bump("misses")
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._bump("hits")
+            return row[0]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses(key, value, created_at, last_access) VALUES(?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        if self.max_entries:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self._bump("evictions")
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("DELETE FROM counters")
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """Process-wide cache instance (the file itself is shared across processes)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+# ==============================================================================
+# SINGLE-FLIGHT
+# ==============================================================================
+class SingleFlight:
+    """Identical concurrent calls share one in-flight task.
+
+    The first caller for a key starts the task; callers arriving while it runs
+    await the same task (shielded, so one caller being cancelled doesn't cancel
+    it for the others) and get the same result or the same exception. The key
+    is released when the task finishes, so failures are retried by the next
+    caller rather than remembered. Tasks are per event loop.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[tuple, asyncio.Task] = {}
+        self.stats = Counter()
+
+    def join(self, key: str, factory: Callable[[], Awaitable]) -> Tuple[asyncio.Task, bool]:
+        """(task, started_here) for this key on the running loop."""
+        loop = asyncio.get_running_loop()
+        slot = (loop, key)
+        task = self._tasks.get(slot)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return task, False
+        task = loop.create_task(factory())
+        self._tasks[slot] = task
+        task.add_done_callback(lambda t: self._release(slot, t))
+        self.stats["started"] += 1
+        return task, True
+
+    def _release(self, slot: tuple, task: asyncio.Task):
+        if self._tasks.get(slot) is task:
+            del self._tasks[slot]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every waiter was cancelled
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+
+_inflight = SingleFlight()
+
+
+def inflight_stats() -> Dict[str, int]:
+    return {"in_flight": len(_inflight), **_inflight.stats}
+
+
+# ==============================================================================
+# AGENT CALL
+# ==============================================================================
+async def run_cached(
+    model: str,
+    output_type: Type[BaseModel],
+    system_prompt: str,
+    prompt: str,
+    check: Optional[Callable[[BaseModel], None]] = None,
+):
+    """Return the agent output for this prompt, calling the model only on a cache miss.
+
+    Concurrent identical misses are coalesced into one model call. Every call
+    (hit, miss, coalesced or failure) is recorded in the request log.
+
+    check(output) may raise (e.g. ValueError) to reject a well-formed but
+    unusable output: a rejected model output is not cached, and a cached
+    output it rejects is treated as a miss.
+    """
+    from agents import get_agent
+
+    started = time.perf_counter()
+    cache = get_cache()
+    with span("cache_lookup", output=output_type.__name__) as s:
+        key = make_key(model, system_prompt, prompt, output_type)
+        hit = cache.get(key)
+        s.attrs["cache_hit"] = hit is not None
+    if hit is not None:
+        with span("validate"):
+            output = output_type.model_validate_json(hit)
+        try:
+            if check is not None:
+                check(output)
+        except Exception:
+            hit = None  # stored before this check existed: call the model again
+        else:
+            record_call(model, output_type, system_prompt, prompt, started, cache_hit=True)
+            return output
+
+    async def call_model():
+        with span("agent_build"):
+            agent = get_agent(model, output_type, system_prompt)
+        try:
+            with span("model_call", output=output_type.__name__):
+                # Shared RPM/TPM budget, fair across sessions; 429s retried with jittered backoff
+                r = await call_limited(model, lambda: agent.run(prompt), estimate_tokens(system_prompt) + estimate_tokens(prompt))
+                usage = usage_of(r)
+                annotate(**usage)
+            if check is not None:
+                check(r.output)
+        except BaseException as e:
+            record_call(model, output_type, system_prompt, prompt, started, error=e)
+            raise
+        record_call(model, output_type, system_prompt, prompt, started, usage=usage)
+        with span("cache_store"):
+            cache.set(key, r.output.model_dump_json())
+        return r.output
+
+    # Identical requests already in flight (e.g. many kiosks scanning one product) share that call
+    task, started_here = _inflight.join(key, call_model)
+    if started_here:
+        return await asyncio.shield(task)
+    with span("coalesced_wait"):
+        try:
+            output = await asyncio.shield(task)
+        except BaseException as e:
+            record_call(model, output_type, system_prompt, prompt, started, error=e, coalesced=True)
+            raise
+    record_call(model, output_type, system_prompt, prompt, started, coalesced=True)
+    return output.model_copy(deep=True)  # waiters must not share one mutable object
+
+
+async def stream_cached(model: str, output_type: Type[BaseModel], system_prompt: str, prompt: str):
+    """Async generator of partial outputs; the last item is the final validated output.
+
+    A cache hit yields the stored output once. On a miss the agent's streaming
+    run is used and the final output is written to the cache.
+    """
+    from agents import get_agent
+
+    started = time.perf_counter()
+    cache = get_cache()
+    with span("cache_lookup", output=output_type.__name__) as s:
+        key = make_key(model, system_prompt, prompt, output_type)
+        hit = cache.get(key)
+        s.attrs["cache_hit"] = hit is not None
+    if hit is not None:
+        record_call(model, output_type, system_prompt, prompt, started, cache_hit=True, stream=True)
+        with span("validate"):
+            output = output_type.model_validate_json(hit)
+        yield output
+        return
+
+    with span("agent_build"):
+        agent = get_agent(model, output_type, system_prompt)
+    try:
+        with span("model_call", output=output_type.__name__, stream=True) as s:
+            async with stream_slot(model, estimate_tokens(system_prompt) + estimate_tokens(prompt)) as grant:
+                async with agent.run_stream(prompt) as result:
+                    async for partial in result.stream_output(debounce_by=STREAM_DEBOUNCE_SECONDS):
+                        s.attrs.setdefault("first_partial_ms", round(s.ms, 1))
+                        yield partial
+                    output = await result.get_output()
+                    usage = usage_of(result)
+                    s.attrs.update(usage)
+                if grant is not None:
+                    grant.settle(usage["input_tokens"] + usage["output_tokens"])
+    except (GeneratorExit, asyncio.CancelledError):
+        raise  # the consumer stopped early (e.g. a Streamlit rerun): not a failed call
+    except Exception as e:
+        record_call(model, output_type, system_prompt, prompt, started, error=e, stream=True)
+        raise
+    record_call(model, output_type, system_prompt, prompt, started, usage=usage, stream=True)
+    with span("cache_store"):
+        cache.set(key, output.model_dump_json())
+    yield output
@@ -0,0 +1,68 @@
+"""
+Batch job: precompute the ReviewSummary for every product.
+
+Run it offline (cron / before store opening) so the QR landing page can serve
+summaries instantly. Products whose review hash hasn't changed are skipped.
+
+    python precompute_summaries.py                # only stale / missing
+    python precompute_summaries.py --force        # regenerate everything
+    python precompute_summaries.py --dry-run      # just report what is stale
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from catalog import get_catalog, get_product_payload
+from flows import DEFAULT_PERSONA, SUMMARY_NAMESPACE, gen_review_summary, summary_fingerprint
+from result_store import get_store
+
+
+async def precompute(product_ids, system_prompt: str, concurrency: int = 4, force: bool = False, dry_run: bool = False):
+    store = get_store(SUMMARY_NAMESPACE)
+    sem = asyncio.Semaphore(concurrency)
+    counts = {"fresh": 0, "generated": 0, "failed": 0, "stale": 0}
+
+    async def one(pid: str):
+        productData, reviews = get_product_payload(pid)
+        fp = summary_fingerprint(reviews, system_prompt)
+        if not force and store.is_fresh(pid, fp):
+            counts["fresh"] += 1
+            return
+        if dry_run:
+            counts["stale"] += 1
+            print(f"[stale] product_id={pid}")
+            return
+        async with sem:
+            try:
+                summary = await gen_review_summary(productData, reviews, system_prompt)
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"[failed] product_id={pid}: {e}", file=sys.stderr)
+                return
+        store.put(pid, fp, summary.model_dump_json())
+        counts["generated"] += 1
+        print(f"[ok] product_id={pid}: {summary.overall_sentiment} · {summary.one_line_summary}")
+
+    await asyncio.gather(*(one(pid) for pid in product_ids))
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--persona", default=DEFAULT_PERSONA, help="System persona used for the summaries")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--force", action="store_true", help="Regenerate even if the review hash is unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="Only list stale products")
+    args = parser.parse_args(argv)
+
+    if not args.dry_run and not os.getenv("OPENAI_API_KEY"):
+        parser.error("OPENAI_API_KEY is not set")
+
+    counts = asyncio.run(precompute(get_catalog().product_ids, args.persona, args.concurrency, args.force, args.dry_run))
+    print(", ".join(f"{k}={v}" for k, v in counts.items()))
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
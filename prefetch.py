@@ -0,0 +1,169 @@
+"""
+Speculative prefetch of review summaries.
+
+When a product page loads, its summary (and the summaries of the products most
+often scanned next) are generated in the background, so the shopper's first
+"Review Summary" click is usually a store hit.
+
+- Prefetcher: jobs run on the shared background loop (async_runner) behind a
+  semaphore. Queued jobs can be cancelled per session, e.g. when the shopper
+  moves on to another product. Jobs that already hold a slot are allowed to
+  finish so their tokens are not wasted.
+- TransitionModel: first-order Markov counts of "product A, then product B"
+  per session, learned from the request log's page views and updated online.
+"""
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from async_runner import submit
+from flows import get_or_generate_summary, get_precomputed_summary
+from request_log import DEFAULT_LOG_PATH, get_logger, iter_records, tagged
+
+PREFETCH_CONCURRENCY = 2
+PREFETCH_MAX_QUEUE = 32
+PREFETCH_NEXT = 2  # likely-next products warmed per page view
+
+
+# ==============================================================================
+# Next-product model
+# ==============================================================================
+class TransitionModel:
+    def __init__(self):
+        self._counts: Dict[str, Counter] = defaultdict(Counter)
+        self._last: "OrderedDict[str, str]" = OrderedDict()  # session → last product seen
+        self._max_sessions = 10_000
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_log(cls, path: str = DEFAULT_LOG_PATH) -> "TransitionModel":
+        """Learn from past page views / calls in the request log (ordered by time per session)."""
+        model = cls()
+        for r in iter_records(path):
+            if r.get("prefetch"):  # our own speculative calls are not shopper behaviour
+                continue
+            if r.get("session_id") and r.get("product_id") is not None:
+                model.observe(r["session_id"], str(r["product_id"]))
+        return model
+
+    def observe(self, session_id: str, product_id: str):
+        with self._lock:
+            prev = self._last.pop(session_id, None)
+            self._last[session_id] = product_id
+            while len(self._last) > self._max_sessions:
+                self._last.popitem(last=False)
+            if prev is not None and prev != product_id:
+                self._counts[prev][product_id] += 1
+
+    def next_products(self, product_id: str, k: int = PREFETCH_NEXT) -> List[str]:
+        with self._lock:
+            return [pid for pid, _ in self._counts.get(product_id, Counter()).most_common(k)]
+
+
+def record_view(session_id: str, product_id: str):
+    """Page view event in the request log (feeds TransitionModel.from_log on the next start)."""
+    get_logger().log({"ts": time.time(), "event": "view", "session_id": session_id, "product_id": product_id})
+
+
+# ==============================================================================
+# Prefetcher
+# ==============================================================================
+class Prefetcher:
+    def __init__(self, max_concurrency: int = PREFETCH_CONCURRENCY, max_queue: int = PREFETCH_MAX_QUEUE):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._sem = None  # asyncio.Semaphore, created on the background loop
+        self._jobs: "OrderedDict[tuple, dict]" = OrderedDict()  # (group, key) → {"future", "running"}
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def enqueue(self, key: str, coro_factory, group: str = "") -> bool:
+        """Queue coro_factory() unless the same key is already queued or running.
+
+        The oldest queued job is cancelled when the queue is full.
+        """
+        with self._lock:
+            if any(k == key for _, k in self._jobs):
+                self.stats["deduped"] += 1
+                return False
+            queued = [jk for jk, job in self._jobs.items() if not job["running"]]
+            if len(queued) >= self.max_queue:
+                self._cancel(queued[0])
+            job = {"running": False, "future": None}
+            self._jobs[(group, key)] = job
+        job["future"] = fut = submit(self._run((group, key), job, coro_factory))
+        fut.add_done_callback(lambda f, jk=(group, key): self._done(jk, f))
+        self.stats["queued"] += 1
+        return True
+
+    async def _run(self, job_key: tuple, job: dict, coro_factory):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+        async with self._sem:
+            job["running"] = True
+            return await coro_factory()
+
+    def _done(self, job_key: tuple, fut: concurrent.futures.Future):
+        with self._lock:
+            self._jobs.pop(job_key, None)
+        if fut.cancelled():
+            self.stats["cancelled"] += 1
+        elif fut.exception() is not None:
+            self.stats["failed"] += 1
+        else:
+            self.stats["done"] += 1
+
+    def _cancel(self, job_key: tuple) -> bool:
+        job = self._jobs.get(job_key)
+        if job is None or job["running"] or job["future"] is None:
+            return False
+        return job["future"].cancel()
+
+    def cancel_group(self, group: str) -> int:
+        """Cancel this group's jobs that have not started yet. Returns #cancelled."""
+        with self._lock:
+            keys = [jk for jk in self._jobs if jk[0] == group]
+            return sum(self._cancel(jk) for jk in keys)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+
+def prefetch_summaries(
+    prefetcher: Prefetcher,
+    catalog,
+    product_ids: Iterable[str],
+    system_prompt: str,
+    session_id: str = "",
+) -> int:
+    """Queue summary generation for products whose stored summary is missing or stale."""
+    queued = 0
+    for pid in product_ids:
+        if pid not in catalog:
+            continue
+        productData, reviews = catalog.payload(pid)
+        if not reviews or get_precomputed_summary(pid, reviews, system_prompt) is not None:
+            continue
+
+        def factory(pid=pid, productData=productData, reviews=reviews):
+            coro = get_or_generate_summary(pid, productData, reviews, system_prompt)
+            return tagged(coro, product_id=pid, session_id=session_id, prefetch=True)
+
+        queued += prefetcher.enqueue(f"summary:{pid}:{hash(system_prompt)}", factory, group=session_id)
+    return queued
+
+
+_prefetcher: Optional[Prefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Prefetcher:
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher()
+        return _prefetcher
@@ -0,0 +1,146 @@
+"""
+Token-budgeted packing of reviews into a prompt.
+
+Reviews are ranked by how much they are likely to add and greedily packed
+until the (offline-estimated) token budget is spent:
+
+- base score: relevance to the question when given (chat), otherwise content
+  length, i.e. log(1 + distinct content words), so "Good!" loses to a review
+  that names textures, skin types and problems;
+- novelty (MMR): minus novelty_weight × the highest word-set Jaccard similarity
+  to a review already picked, so ten paraphrases of "absorbs quickly" don't
+  use up the budget;
+- rating spread (when ratings are known): minus rating_weight × the share of
+  picked reviews with the same rating, so 1★ and 5★ both get a voice.
+
+The result says what was kept, what was dropped and how many tokens were used,
+so every prompt's size is known before it is sent.
+
+    packed = pack_reviews(reviews, budget=1200)
+    packed.items        # reviews to put in the prompt
+    packed.report()     # {"kept": 8, "dropped": 112, "tokens": 1187, "budget": 1200}
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from tokens import estimate_tokens, tokenize, truncate_to_tokens
+
+NOVELTY_WEIGHT = 0.7
+RATING_WEIGHT = 0.5
+
+
+@dataclass
+class Packed:
+    items: List[str]
+    kept: List[int]  # indices into the input, in items order
+    dropped: List[int] = field(default_factory=list)
+    tokens: int = 0
+    budget: int = 0
+    truncated: int = 0  # kept reviews cut to max_item_tokens
+
+    def report(self) -> dict:
+        return {
+            "kept": len(self.kept),
+            "dropped": len(self.dropped),
+            "truncated": self.truncated,
+            "tokens": self.tokens,
+            "budget": self.budget,
+        }
+
+
+class _Overlap:
+    """Word-set Jaccard of one review against all others via inverted postings."""
+
+    def __init__(self, docs: List[set]):
+        self.sizes = np.array([len(d) for d in docs], dtype=np.float64)
+        postings: Dict[str, List[int]] = {}
+        for i, d in enumerate(docs):
+            for t in d:
+                postings.setdefault(t, []).append(i)
+        self.postings = {t: np.array(ids, dtype=np.int64) for t, ids in postings.items()}
+        self.docs = docs
+
+    def jaccard(self, j: int) -> np.ndarray:
+        n = len(self.sizes)
+        if not self.docs[j]:
+            return np.zeros(n)
+        shared = np.bincount(np.concatenate([self.postings[t] for t in self.docs[j]]), minlength=n)
+        union = self.sizes + self.sizes[j] - shared
+        return np.divide(shared, union, out=np.zeros(n), where=union > 0)
+
+
+def pack_reviews(
+    reviews: Sequence[str],
+    budget: int,
+    relevance: Optional[Sequence[float]] = None,
+    ratings: Optional[Sequence] = None,
+    max_items: Optional[int] = None,
+    max_item_tokens: Optional[int] = None,
+    novelty_weight: float = NOVELTY_WEIGHT,
+    rating_weight: float = RATING_WEIGHT,
+    keep_order: bool = False,
+) -> Packed:
+    """Most informative reviews that fit budget estimated tokens.
+
+    Everything is kept, in input order, when it already fits. Otherwise items
+    are in pick order (best first) unless keep_order is set. Reviews longer
+    than max_item_tokens are truncated rather than skipped.
+    """
+    texts = list(reviews)
+    if max_item_tokens:
+        cut = [truncate_to_tokens(t, max_item_tokens) for t in texts]
+        truncated = {i for i, (a, b) in enumerate(zip(texts, cut)) if a != b}
+        texts = cut
+    else:
+        truncated = set()
+    cost = np.array([estimate_tokens(t) for t in texts], dtype=np.int64)
+    n = len(texts)
+
+    if cost.sum() <= budget and (max_items is None or n <= max_items):
+        return Packed(texts, list(range(n)), [], int(cost.sum()), budget, len(truncated))
+
+    docs = [set(tokenize(t)) for t in texts]
+    if relevance is not None:
+        base = np.asarray(relevance, dtype=np.float64)
+        base = base / base.max() if base.max() > 0 else np.zeros(n)
+    else:
+        base = np.log1p([len(d) for d in docs])
+        base = base / base.max() if n and base.max() > 0 else np.zeros(n)
+    overlap = _Overlap(docs)
+    max_sim = np.zeros(n)
+    rating_keys = None
+    if ratings is not None:
+        _, rating_keys = np.unique(np.asarray([str(r) for r in ratings]), return_inverse=True)
+        rating_picked = np.zeros(rating_keys.max() + 1 if n else 0)
+
+    available = np.ones(n, dtype=bool)
+    kept: List[int] = []
+    used = 0
+    while max_items is None or len(kept) < max_items:
+        available &= cost <= budget - used
+        if not available.any():
+            break
+        score = base - novelty_weight * max_sim
+        if rating_keys is not None and kept:
+            score = score - rating_weight * rating_picked[rating_keys] / len(kept)
+        j = int(np.argmax(np.where(available, score, -np.inf)))
+        kept.append(j)
+        used += int(cost[j])
+        available[j] = False
+        max_sim = np.maximum(max_sim, overlap.jaccard(j))
+        if rating_keys is not None:
+            rating_picked[rating_keys[j]] += 1
+
+    if keep_order:
+        kept.sort()
+    chosen = set(kept)
+    return Packed(
+        [texts[i] for i in kept],
+        kept,
+        [i for i in range(n) if i not in chosen],
+        used,
+        budget,
+        len(truncated & chosen),
+    )
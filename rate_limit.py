@@ -0,0 +1,272 @@
+"""
+Process-wide rate limiting for OpenAI calls.
+
+- Two token buckets: requests per minute and (estimated) tokens per minute.
+  A call reserves its prompt estimate plus EXPECTED_OUTPUT_TOKENS up front and
+  the difference is settled with the real usage afterwards.
+- A fair queue: waiting calls are admitted round-robin across sessions (the
+  session_id request-log tag), so one busy kiosk can't starve the others.
+- An AIMD concurrency limit: grows by ~1 per window of successful calls and
+  halves on 429s (at most once per cooldown, so one burst of 429s is one
+  signal). Latency is deliberately not a signal: it mostly tracks output
+  length, and a mix of short translations and long summaries would read as
+  overload. Throughput settles at the quota instead of collapsing.
+- Jittered exponential backoff ("full jitter") when OpenAI answers 429 anyway.
+
+    result = await call_limited(model, lambda: agent.run(prompt), estimate_tokens(prompt))
+
+    async with get_limiter().slot(est_tokens) as grant:    # streaming calls
+        ...
+        grant.settle(actual_tokens)
+
+Only "openai:" models are limited; test and function models pass straight through.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, nullcontext
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from request_log import current_context, usage_of
+
+T = TypeVar("T")
+
+RPM = float(os.getenv("OLIVE_OPENAI_RPM", "500"))
+TPM = float(os.getenv("OLIVE_OPENAI_TPM", "200000"))
+EXPECTED_OUTPUT_TOKENS = 400
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 20.0
+DECREASE_COOLDOWN_SECONDS = 2.0
+
+
+def is_rate_limited(e: BaseException) -> bool:
+    return getattr(e, "status_code", None) == 429
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_CAP_SECONDS) -> float:
+    """Full jitter: uniform(0, min(cap, base * 2^attempt))."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute, holds at most one minute's worth."""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.level = rate_per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount is available (amounts above capacity wait for a full bucket)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= amount  # may go negative when settling real usage: that's debt, repaid by refill
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit driven by rate-limit errors."""
+
+    def __init__(self, initial: float = 8, minimum: float = 1, maximum: float = 64, cooldown: float = DECREASE_COOLDOWN_SECONDS):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cooldown = cooldown
+        self._last_decrease = float("-inf")
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_rate_limited(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        if now - self._last_decrease >= self.cooldown:  # calls in flight during one 429 burst all fail together
+            self.limit = max(self.minimum, self.limit / 2)
+            self._last_decrease = now
+
+
+class Grant:
+    """One admitted call; settle() corrects the token reservation with real usage."""
+
+    def __init__(self, limiter: "RateLimiter", reserved: float):
+        self._limiter = limiter
+        self.reserved = reserved
+
+    def settle(self, actual_tokens: int):
+        if actual_tokens:
+            with self._limiter._lock:
+                self._limiter.tokens.take(actual_tokens - self.reserved)
+            self.reserved = actual_tokens
+
+
+class RateLimiter:
+    def __init__(self, rpm: float = RPM, tpm: float = TPM, concurrency: Optional[AdaptiveLimit] = None):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = concurrency or AdaptiveLimit()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()  # session → waiting (future, tokens)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    # --- queue -----------------------------------------------------------------
+    def _ensure_dispatcher(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._dispatcher is None or self._dispatcher.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    def _wake(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _next_waiter(self):
+        """Round-robin over sessions: the head of the session that waited longest since its last turn."""
+        while self._queues:
+            session, q = next(iter(self._queues.items()))
+            while q and q[0][0].done():  # cancelled while waiting
+                q.popleft()
+            if not q:
+                del self._queues[session]
+                continue
+            return session, q
+        return None
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()  # before looking, so a wake-up during the check isn't lost
+            with self._lock:
+                now = time.monotonic()
+                head = self._next_waiter()
+                wait = None
+                if head is not None and self.in_flight < int(self.concurrency.limit):
+                    session, q = head
+                    fut, amount = q[0]
+                    wait = max(
+                        self.paused_until - now,
+                        self.requests.wait_time(1, now),
+                        self.tokens.wait_time(amount, now),
+                    )
+                    if wait <= 0:
+                        q.popleft()
+                        self._queues.move_to_end(session)  # this session goes to the back of the line
+                        self.requests.take(1)
+                        self.tokens.take(amount)
+                        self.in_flight += 1
+                        fut.set_result(Grant(self, amount))
+                        continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    @asynccontextmanager
+    async def slot(self, est_tokens: int):
+        """Wait for a fair turn under the RPM/TPM/concurrency limits; hold it for the call."""
+        self._ensure_dispatcher()
+        session = str(current_context().get("session_id") or "")
+        fut = asyncio.get_running_loop().create_future()
+        amount = est_tokens + EXPECTED_OUTPUT_TOKENS
+        with self._lock:
+            self._queues.setdefault(session, deque()).append((fut, amount))
+        self._wake()
+        try:
+            grant = await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():  # admitted just as we were cancelled
+                self._release()
+            raise
+        try:
+            yield grant
+        except BaseException as e:
+            if is_rate_limited(e):
+                self.on_rate_limited()
+            raise
+        else:
+            with self._lock:
+                self.concurrency.on_success()
+        finally:
+            self._release()
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._wake()
+
+    def on_rate_limited(self, pause: float = 1.0):
+        """OpenAI said 429: halve concurrency and hold new admissions briefly."""
+        with self._lock:
+            self.concurrency.on_rate_limited()
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+        self._wake()
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            return {
+                "in_flight": self.in_flight,
+                "waiting": sum(len(q) for q in self._queues.values()),
+                "concurrency_limit": round(self.concurrency.limit, 1),
+                "rpm_available": int(self.requests.level),
+                "tpm_available": int(self.tokens.level),
+            }
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> RateLimiter:
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def is_limited_model(model) -> bool:
+    return isinstance(model, str) and model.startswith("openai:")
+
+
+def stream_slot(model, est_tokens: int):
+    """Limiter slot for a streaming call (no retries: partial output may already be shown)."""
+    return get_limiter().slot(est_tokens) if is_limited_model(model) else nullcontext()
+
+
+async def call_limited(model, call: Callable[[], Awaitable[T]], est_tokens: int, retries: int = MAX_RETRIES) -> T:
+    """Run call() under the shared limiter, retrying 429s with jittered backoff.
+
+    call must start a fresh request each time it is invoked (e.g. lambda: agent.run(prompt)).
+    """
+    if not is_limited_model(model):
+        return await call()
+    limiter = get_limiter()
+    for attempt in range(retries + 1):
+        try:
+            async with limiter.slot(est_tokens) as grant:
+                result = await call()
+                if hasattr(result, "usage"):
+                    usage = usage_of(result)
+                    grant.settle(usage["input_tokens"] + usage["output_tokens"])
+                return result
+        except Exception as e:
+            if not is_rate_limited(e) or attempt == retries:
+                raise
+        await asyncio.sleep(backoff_delay(attempt))
+    raise AssertionError("unreachable")
@@ -0,0 +1,366 @@
+"""
+Structured request log: one JSONL record per agent call.
+
+Every call that goes through llm_cache.run_cached / stream_cached is recorded
+with product_id, mode, an offline prompt-token estimate, token usage, latency,
+cache hit and error. Callers only enqueue the record; a daemon thread writes
+batches to disk and rotates the file by size (requests.jsonl → .1 → .2 ...),
+so logging never blocks the event loop or the Streamlit script.
+
+The log lives in logs/requests.jsonl (override with OLIVE_REQUEST_LOG).
+
+    @logged_as("chat")                        # flows.py: one mode per flow
+    async def gen_chat(...): ...
+    run_async(tagged(gen_chat(...), product_id="3"))   # callers add the product
+
+    python request_log.py                     # latency / throughput / cost report
+    python request_log.py --by mode,product_id+mode --path logs/requests.jsonl
+"""
+import argparse
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from tokens import estimate_tokens
+
+DEFAULT_LOG_PATH = os.getenv(
+    "OLIVE_REQUEST_LOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "requests.jsonl")
+)
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+FLUSH_INTERVAL_SECONDS = 1.0
+
+# USD per 1M tokens (input, output); cache hits cost nothing
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+_context: contextvars.ContextVar = contextvars.ContextVar("request_log_context", default={})
+
+
+# ==============================================================================
+# Call context (product_id, mode, ...)
+# ==============================================================================
+@contextlib.contextmanager
+def log_context(**fields):
+    """Tag every call made inside this block (and tasks it spawns) with fields."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        with contextlib.suppress(ValueError):  # async generator finalized in another context
+            _context.reset(token)
+
+
+def current_context() -> dict:
+    """Tags in effect for the current task (session_id, product_id, mode, ...)."""
+    return dict(_context.get())
+
+
+def tagged(aw, **fields):
+    """Wrap a coroutine or async generator so its calls are logged with fields."""
+    if hasattr(aw, "__aiter__"):
+        return _tagged_stream(aw, fields)
+    return _tagged(aw, fields)
+
+
+def logged_as(mode: str):
+    """Decorator for flow functions: calls made inside are logged under this mode."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return tagged(fn(*args, **kwargs), mode=mode)
+        return wrapper
+    return decorate
+
+
+async def _tagged(coro, fields: dict):
+    with log_context(**fields):
+        return await coro
+
+
+async def _tagged_stream(agen, fields: dict):
+    with log_context(**fields):
+        async for item in agen:
+            yield item
+
+
+# ==============================================================================
+# Writer
+# ==============================================================================
+class RequestLogger:
+    def __init__(
+        self,
+        path: str = DEFAULT_LOG_PATH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backups: int = DEFAULT_BACKUPS,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        max_queue: int = 10_000,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def log(self, record: Dict[str, Any]):
+        """Enqueue one record; never blocks (records are dropped if the writer falls behind)."""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Wait until everything enqueued so far is on disk."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="olive-request-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        f = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                try:
+                    batch = [self._queue.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    continue
+                while len(batch) < 1000:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                lines = [json.dumps(r, ensure_ascii=False) + "\n" for r in batch if isinstance(r, dict)]
+                if lines:
+                    f.write("".join(lines))
+                    f.flush()
+                    if f.tell() >= self.max_bytes:
+                        f.close()
+                        self._rotate()
+                        f = open(self.path, "a", encoding="utf-8")
+                for r in batch:
+                    if isinstance(r, threading.Event):
+                        r.set()
+        finally:
+            f.close()
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+_logger: Optional[RequestLogger] = None
+_logger_lock = threading.Lock()
+
+
+def get_logger() -> RequestLogger:
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            _logger = RequestLogger()
+            atexit.register(_logger.flush)
+        return _logger
+
+
+def usage_of(result) -> Dict[str, int]:
+    """Token usage of an agent run (RunUsage is a property in newer pydantic-ai, a method in older)."""
+    u = result.usage
+    if callable(u):
+        u = u()
+    return {
+        "input_tokens": getattr(u, "input_tokens", None) or getattr(u, "request_tokens", None) or 0,
+        "output_tokens": getattr(u, "output_tokens", None) or getattr(u, "response_tokens", None) or 0,
+        "requests": getattr(u, "requests", 0) or 0,
+    }
+
+
+def record_call(
+    model,
+    output_type: type,
+    system_prompt: str,
+    prompt: str,
+    started: float,
+    cache_hit: bool = False,
+    usage: Optional[Dict[str, int]] = None,
+    error: Optional[BaseException] = None,
+    stream: bool = False,
+    coalesced: bool = False,
+):
+    """Build and enqueue the record for one agent call (started = time.perf_counter()).
+
+    coalesced marks a caller that shared another caller's in-flight model call
+    (its usage is 0; the shared call is recorded once, by the caller that started it).
+    """
+    ctx = _context.get()
+    record = {
+        "ts": time.time(),
+        "product_id": ctx.get("product_id"),
+        "mode": ctx.get("mode") or output_type.__name__,
+        "model": model if isinstance(model, str) else getattr(model, "model_name", type(model).__name__),
+        "output_type": output_type.__name__,
+        "prompt_tokens_est": estimate_tokens(system_prompt) + estimate_tokens(prompt),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "cache_hit": cache_hit,
+        "stream": stream,
+        "coalesced": coalesced,
+        "usage": usage or {"input_tokens": 0, "output_tokens": 0, "requests": 0},
+        "error": None if error is None else f"{type(error).__name__}: {error}",
+    }
+    record.update({k: v for k, v in ctx.items() if k not in record})
+    get_logger().log(record)
+
+
+# ==============================================================================
+# Analyzer (CLI)
+# ==============================================================================
+def iter_records(path: str = DEFAULT_LOG_PATH, backups: int = DEFAULT_BACKUPS) -> Iterator[dict]:
+    """Stream records oldest first, across rotated files; unreadable lines are skipped."""
+    files = [f"{path}.{i}" for i in range(backups, 0, -1)] + [path]
+    for name in files:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def cost_of(record: dict) -> float:
+    if record.get("cache_hit"):
+        return 0.0
+    price_in, price_out = PRICES.get(str(record.get("model", "")).split(":")[-1], (0.0, 0.0))
+    usage = record.get("usage") or {}
+    return (usage.get("input_tokens", 0) * price_in + usage.get("output_tokens", 0) * price_out) / 1e6
+
+
+class _Group:
+    __slots__ = ("latencies", "errors", "hits", "tokens_in", "tokens_out", "cost", "first", "last")
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = self.hits = self.tokens_in = self.tokens_out = 0
+        self.cost = 0.0
+        self.first = self.last = None
+
+    def add(self, r: dict):
+        self.latencies.append(float(r.get("latency_ms", 0.0)))
+        self.errors += bool(r.get("error"))
+        self.hits += bool(r.get("cache_hit"))
+        usage = r.get("usage") or {}
+        self.tokens_in += usage.get("input_tokens", 0)
+        self.tokens_out += usage.get("output_tokens", 0)
+        self.cost += cost_of(r)
+        ts = r.get("ts")
+        if ts is not None:
+            self.first = ts if self.first is None else min(self.first, ts)
+            self.last = ts if self.last is None else max(self.last, ts)
+
+    def row(self, name: str) -> dict:
+        lat = np.asarray(self.latencies)
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99]) if len(lat) else (0.0, 0.0, 0.0)
+        span = (self.last - self.first) if self.first is not None else 0.0
+        return {
+            "group": name,
+            "n": len(lat),
+            "errors": self.errors,
+            "cache_hit_rate": self.hits / len(lat) if len(lat) else 0.0,
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "rps": len(lat) / span if span > 0 else None,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "cost_usd": self.cost,
+        }
+
+
+def analyze(records, by: List[str]) -> Dict[str, List[dict]]:
+    """{dimension: [row, ...]} with one row per distinct value, plus an "all" row."""
+    groups: Dict[str, Dict[str, _Group]] = {dim: {} for dim in by}
+    total = _Group()
+    for r in records:
+        if r.get("event"):  # page views etc., not agent calls
+            continue
+        total.add(r)
+        for dim in by:
+            key = "+".join(str(r.get(d)) for d in dim.split("+"))
+            groups[dim].setdefault(key, _Group()).add(r)
+    report = {dim: [g.row(k) for k, g in sorted(rows.items())] for dim, rows in groups.items()}
+    report["all"] = [total.row("all")]
+    return report
+
+
+def format_report(report: Dict[str, List[dict]]) -> str:
+    header = f"{'group':<24}{'n':>7}{'err':>5}{'hit%':>6}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'rps':>8}{'tok_in':>9}{'tok_out':>9}{'cost$':>10}"
+    out = []
+    for dim, rows in report.items():
+        out.append(f"\n== by {dim} ==")
+        out.append(header)
+        for r in rows:
+            rps = f"{r['rps']:.2f}" if r["rps"] is not None else "-"
+            out.append(
+                f"{r['group'][:23]:<24}{r['n']:>7}{r['errors']:>5}{100 * r['cache_hit_rate']:>5.0f}%"
+                f"{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{r['p99_ms']:>9.0f}{rps:>8}"
+                f"{r['tokens_in']:>9}{r['tokens_out']:>9}{r['cost_usd']:>10.4f}"
+            )
+    return "\n".join(out)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Latency, throughput and cost report for the request log.")
+    parser.add_argument("--path", default=DEFAULT_LOG_PATH)
+    parser.add_argument("--by", default="mode,product_id", help="comma-separated fields; join with + to cross them")
+    parser.add_argument("--since", type=float, default=None, help="only records from the last N seconds")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    records = iter_records(args.path)
+    if args.since is not None:
+        cutoff = time.time() - args.since
+        records = (r for r in records if r.get("ts", 0) >= cutoff)
+    report = analyze(records, [d.strip() for d in args.by.split(",") if d.strip()])
+    if not report["all"][0]["n"]:
+        print(f"no records in {args.path}")
+        return 1
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Precomputed agent results keyed by an id plus a content fingerprint.
+
+A stored value is only served while its fingerprint still matches, so a
+product's entry is regenerated exactly when its reviews (or persona) change.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+DEFAULT_STORE_PATH = os.getenv(
+    "OLIVE_RESULT_STORE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "results.sqlite3"),
+)
+
+
+def fingerprint(*parts) -> str:
+    """Stable hash of JSON-serializable parts (e.g. a review list and a persona)."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    """One SQLite table per namespace: key → (fingerprint, JSON value)."""
+
+    def __init__(self, namespace: str, path: str = DEFAULT_STORE_PATH):
+        if not namespace.isidentifier():
+            raise ValueError(f"Invalid namespace: {namespace!r}")
+        self.namespace = namespace
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {namespace} (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    def get(self, key: str, fp: str) -> Optional[str]:
+        """Stored JSON for key, or None if missing or stale."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT fingerprint, value FROM {self.namespace} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[0] != fp:
+            return None
+        return row[1]
+
+    def is_fresh(self, key: str, fp: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT 1 FROM {self.namespace} WHERE key = ? AND fingerprint = ?", (key, fp)
+            ).fetchone()
+        return row is not None
+
+    def put(self, key: str, fp: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.namespace}(key, fingerprint, value, updated_at) VALUES(?, ?, ?, ?)",
+                (key, fp, value, time.time()),
+            )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.namespace} WHERE key = ?", (key,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            (n,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.namespace}").fetchone()
+        return n
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(namespace: str) -> ResultStore:
+    """Process-wide store per namespace."""
+    with _stores_lock:
+        if namespace not in _stores:
+            _stores[namespace] = ResultStore(namespace)
+        return _stores[namespace]
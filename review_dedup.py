@@ -0,0 +1,252 @@
+"""
+Exact and near-duplicate review detection with MinHash + LSH, in NumPy.
+
+Each review becomes a set of word 3-gram shingles (tokens.tokenize, so case,
+punctuation and stopwords don't matter) and a MinHash signature of NUM_PERM
+values, computed for a batch of reviews at a time. Signatures are split into
+BANDS bands; a review is only compared with the earlier reviews it shares a
+band with (the first and the previous member of each band bucket), so the
+work stays near-linear instead of all pairs. Candidates are confirmed when the
+signatures agree on at least THRESHOLD of their values (≈ Jaccard similarity
+of the shingle sets). Exact copies are caught by an 8-byte digest of the
+normalized text.
+
+Per review only the digest, the signature and its length are kept (~280
+bytes), never the text. The first copy of a review is kept, later copies
+point at it. Copies under another product only count when the review has at
+least MIN_CROSS_GROUP_TOKENS content words: "Good!", "Love it!" or "좋아요!!"
+are written independently by many shoppers and are kept under every product;
+within one product any copy collapses.
+
+The catalog does not rebuild this on every start: the duplicate map is saved
+to data/review_duplicates.json together with the size and SHA-256 of the
+reviews file it describes, and only recomputed when the file changed.
+
+    python review_dedup.py                 # list duplicate clusters in data/reviews.jsonl
+    python review_dedup.py --write         # (re)build data/review_duplicates.json offline
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from typing import Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from tokens import tokenize
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DUPLICATES_PATH = os.getenv("OLIVE_REVIEW_DUPLICATES_PATH", os.path.join(DATA_DIR, "review_duplicates.json"))
+
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band: pairs above ~0.5 Jaccard almost always share a band
+THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+SIGN_BATCH = 512  # reviews signed per vectorized pass
+MIN_CROSS_GROUP_TOKENS = 6  # shorter reviews only collapse within their own product
+
+_PRIME = (1 << 31) - 1
+
+
+def shingles(tokens: Sequence[str], k: int = SHINGLE_SIZE) -> np.ndarray:
+    """32-bit hashes of the word k-grams (the whole text for reviews shorter than k words)."""
+    grams = [" ".join(tokens[i:i + k]) for i in range(max(1, len(tokens) - k + 1))]
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams)))
+
+
+def _digest(normalized: str) -> int:
+    return int.from_bytes(hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class DuplicateIndex:
+    """Collect reviews in file order with add(), then resolve() them in one pass."""
+
+    def __init__(self, threshold: float = THRESHOLD, num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        rng = np.random.default_rng(seed)
+        # h(x) = (a·x + b) mod p with a, x < p = 2^31 - 1, so a·x fits in uint64
+        self._a = rng.integers(1, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self.threshold = threshold
+        self.bands = bands
+        self.keys: List[Hashable] = []
+        self._groups: List[Hashable] = []
+        self._lengths: List[int] = []
+        self._digests: List[int] = []
+        self._signatures: List[np.ndarray] = []  # one (batch, num_perm) uint32 block per SIGN_BATCH reviews
+        self._pending: List[List[str]] = []
+
+    def signatures(self, token_lists: Sequence[Sequence[str]]) -> np.ndarray:
+        """(n, num_perm) MinHash signatures, one vectorized pass over all shingles of the batch."""
+        sets = [shingles(t) for t in token_lists]
+        if not sets:
+            return np.zeros((0, len(self._a)), dtype=np.uint32)
+        x = np.concatenate(sets) % _PRIME
+        starts = np.cumsum([0] + [len(s) for s in sets[:-1]])
+        hashed = (self._a * x[None, :] + self._b) % _PRIME
+        return np.minimum.reduceat(hashed, starts, axis=1).T.astype(np.uint32)
+
+    def add(self, key: Hashable, text: str, group: Hashable = None):
+        """group is the product: short reviews only match copies in the same group."""
+        tokens = tokenize(text)
+        self.keys.append(key)
+        self._groups.append(group)
+        self._lengths.append(len(tokens))
+        self._digests.append(_digest(" ".join(tokens)))
+        self._pending.append(tokens)
+        if len(self._pending) >= SIGN_BATCH:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._signatures.append(self.signatures(self._pending))
+            self._pending = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def resolve(self) -> Dict[Hashable, Hashable]:
+        """{key of a duplicate: key of its first copy}."""
+        self._flush()
+        n = len(self.keys)
+        if n < 2:
+            return {}
+        sig = np.concatenate(self._signatures)
+        order = np.arange(n)
+        _, group = np.unique(np.array([str(g) for g in self._groups]), return_inverse=True)
+        group = group.ravel()
+        long = np.array(self._lengths) >= MIN_CROSS_GROUP_TOKENS
+
+        # Exact copies: first index with the same digest (within the same group for short reviews)
+        digests = np.array(self._digests, dtype=np.uint64)
+        _, first_idx, inverse = np.unique(digests, return_index=True, return_inverse=True)
+        exact_first = first_idx[inverse.ravel()]
+        _, first_idx, inverse = np.unique(np.stack([digests, group.astype(np.uint64)], axis=1), axis=0,
+                                          return_index=True, return_inverse=True)
+        exact_first = np.where(long, exact_first, first_idx[inverse.ravel()])
+
+        # LSH: per band, candidates are the bucket's first member and the previous member
+        rows = sig.shape[1] // self.bands
+        mult = np.array([0x9E3779B1 ** (r + 1) & 0xFFFFFFFFFFFFFFFF for r in range(rows)], dtype=np.uint64)
+        band_keys = (sig.reshape(n, self.bands, rows).astype(np.uint64) * mult).sum(axis=2)
+        candidates = []
+        for b in range(self.bands):
+            srt = np.lexsort((order, band_keys[:, b]))
+            keys = band_keys[srt, b]
+            new_group = np.r_[True, keys[1:] != keys[:-1]]
+            group_first = srt[np.maximum.accumulate(np.where(new_group, np.arange(n), 0))]
+            prev = np.where(new_group, srt, np.r_[srt[:1], srt[:-1]])
+            for cand in (group_first, prev):
+                c = np.empty(n, dtype=np.int64)
+                c[srt] = cand
+                candidates.append(c)
+        cand = np.stack(candidates, axis=1)  # (n, 2 * bands), each < own index or == own index
+        similar = np.zeros(cand.shape, dtype=bool)
+        for start in range(0, n, 4096):  # bounded (block, 2·bands, num_perm) comparison
+            block = slice(start, start + 4096)
+            similar[block] = (sig[cand[block]] == sig[block][:, None, :]).mean(axis=2) >= self.threshold
+        similar &= cand < order[:, None]
+        similar &= (group[cand] == group[:, None]) | (long[cand] & long[:, None])
+        near_first = np.where(similar, cand, n).min(axis=1)
+
+        match = np.minimum(np.where(exact_first < order, exact_first, n), near_first)
+        first = order.copy()
+        for i in np.flatnonzero(match < n):  # ascending, so first[match] is already resolved
+            first[i] = first[match[i]]
+        return {self.keys[i]: self.keys[first[i]] for i in np.flatnonzero(first != order)}
+
+
+def find_duplicates(texts: Sequence[str], groups: Optional[Sequence[Hashable]] = None,
+                    threshold: float = THRESHOLD) -> Dict[int, int]:
+    """{index of a duplicate: index of its first copy} for a list of texts (groups: product per text)."""
+    index = DuplicateIndex(threshold)
+    for i, text in enumerate(texts):
+        index.add(i, text, groups[i] if groups is not None else None)
+    return index.resolve()
+
+
+# ==============================================================================
+# Persisted duplicate map for a reviews file
+# ==============================================================================
+def load_duplicate_map(size: int, sha256: str, path: str = DUPLICATES_PATH) -> Optional[Dict[int, int]]:
+    """{byte offset of a duplicate: byte offset of its first copy}, or None if missing or stale."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    settings = (raw.get("threshold"), raw.get("min_cross_group_tokens"))
+    if raw.get("reviews_size") != size or raw.get("reviews_sha256") != sha256 or settings != (THRESHOLD, MIN_CROSS_GROUP_TOKENS):
+        return None
+    return {int(dup): int(first) for dup, first in raw["duplicates"].items()}
+
+
+def save_duplicate_map(duplicates: Dict[int, int], size: int, sha256: str, path: str = DUPLICATES_PATH):
+    payload = {
+        "reviews_size": size,
+        "reviews_sha256": sha256,
+        "threshold": THRESHOLD,
+        "min_cross_group_tokens": MIN_CROSS_GROUP_TOKENS,
+        "duplicates": {str(dup): first for dup, first in sorted(duplicates.items())},
+    }
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+            f.write("\n")
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def build_duplicate_map(reviews_path: str) -> tuple:
+    """(duplicates by byte offset, file size, sha256) for a reviews .jsonl file."""
+    index = DuplicateIndex()
+    sha = hashlib.sha256()
+    with open(reviews_path, "rb") as f:
+        offset = f.tell()
+        for line in iter(f.readline, b""):
+            sha.update(line)
+            if line.strip():
+                record = json.loads(line)
+                index.add(offset, record.get("text", ""), str(record["product_id"]))
+            offset = f.tell()
+    return index.resolve(), offset, sha.hexdigest()
+
+
+def main(argv=None):
+    from catalog import REVIEWS_PATH
+
+    parser = argparse.ArgumentParser(description="List exact and near-duplicate reviews.")
+    parser.add_argument("--reviews", default=REVIEWS_PATH)
+    parser.add_argument("--write", action="store_true", help=f"save the duplicate map to {DUPLICATES_PATH}")
+    args = parser.parse_args(argv)
+
+    duplicates, size, sha = build_duplicate_map(args.reviews)
+    if args.write:
+        save_duplicate_map(duplicates, size, sha)
+
+    records = {}
+    with open(args.reviews, "rb") as f:
+        for number, line in enumerate(iter(lambda: (f.tell(), f.readline()), (None, b"")), start=1):
+            offset, raw = line
+            if not raw:
+                break
+            if raw.strip():
+                records[offset] = (number, json.loads(raw))
+    clusters: Dict[int, List[int]] = {}
+    for dup, first in duplicates.items():
+        clusters.setdefault(first, []).append(dup)
+    print(f"{len(records)} reviews · {len(duplicates)} duplicates in {len(clusters)} clusters")
+    for first, copies in clusters.items():
+        line, rec = records[first]
+        where = ", ".join(f"product {records[o][1]['product_id']} (line {records[o][0]})" for o in copies)
+        print(f"- product {rec['product_id']} (line {line}) ← {where}")
+        print(f"    {rec.get('text', '')[:100]!r}")
+
+
+if __name__ == "__main__":
+    main()
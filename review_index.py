@@ -0,0 +1,56 @@
+"""
+Per-product BM25 index over review texts, scored with NumPy.
+
+Postings (term → review ids, precomputed BM25 weights) are built once; a query
+is then a handful of np.bincount calls, so selecting the top-k reviews for a
+chatbot question stays cheap even for products with thousands of reviews.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from tokens import tokenize
+
+
+class ReviewIndex:
+    def __init__(self, reviews: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.reviews = list(reviews)
+        n = len(self.reviews)
+        docs = [tokenize(r) for r in self.reviews]
+        lengths = np.array([len(d) for d in docs], dtype=np.float64)
+        avgdl = lengths.mean() if n and lengths.sum() else 1.0
+
+        tf: Dict[str, Dict[int, int]] = {}
+        for i, terms in enumerate(docs):
+            for t in terms:
+                row = tf.setdefault(t, {})
+                row[i] = row.get(i, 0) + 1
+
+        norm = k1 * (1 - b + b * lengths / avgdl)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for t, row in tf.items():
+            ids = np.fromiter(row.keys(), dtype=np.int64, count=len(row))
+            freqs = np.fromiter(row.values(), dtype=np.float64, count=len(row))
+            idf = np.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            self._postings[t] = (ids, idf * freqs * (k1 + 1) / (freqs + norm[ids]))
+
+    def __len__(self) -> int:
+        return len(self.reviews)
+
+    def scores(self, query: str) -> np.ndarray:
+        total = np.zeros(len(self.reviews), dtype=np.float64)
+        for t in set(tokenize(query)):
+            if t in self._postings:
+                ids, weights = self._postings[t]
+                total += np.bincount(ids, weights=weights, minlength=len(self.reviews))
+        return total
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (review index, score) pairs with a positive score, best first."""
+        s = self.scores(query)
+        if not len(s):
+            return []
+        k = min(k, len(s))
+        top = np.argpartition(-s, k - 1)[:k]
+        top = top[np.argsort(-s[top], kind="stable")]
+        return [(int(i), float(s[i])) for i in top if s[i] > 0]
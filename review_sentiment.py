@@ -0,0 +1,229 @@
+"""
+Local (no model call) review sentiment and pros/cons, the first tier of the
+review summary.
+
+Reviews are split into sentences and every sentence is scored against a small
+English/Korean polarity lexicon and an aspect lexicon (absorption, texture,
+hydration, ...) with NumPy string ops, one pass per term over the whole batch,
+like skin_scores.classify. A term right after a negator ("not sticky", "no
+white cast", "without irritation") counts for the opposite polarity.
+
+- overall_sentiment: share of positive vs negative reviews;
+- pros / cons: the aspects most often mentioned in positive / negative
+  sentences, as short fixed labels;
+- confidence: how much of the text the lexicon understood and how clear the
+  verdict is. flows.get_or_generate_summary only calls the model when it is
+  below LOCAL_SUMMARY_CONFIDENCE (or there are no pros/cons to show).
+
+    python review_sentiment.py          # local summary + confidence per product
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from schemas import ReviewSummary
+
+LOCAL_SUMMARY_CONFIDENCE = 0.6
+POSITIVE_SHARE = 0.7  # of polar reviews, for "positive" (and likewise for "negative")
+FULL_CONFIDENCE_REVIEWS = 5  # fewer reviews than this scale confidence down
+
+# Latin terms match at a word start ("sooth" also hits "soothing"); Hangul terms anywhere
+POSITIVE = [
+    "good", "great", "love", "gentle", "moist", "hydrat", "sooth", "calm", "comfortable", "smooth", "soft",
+    "supple", "fresh", "recommend", "favorite", "favourite", "perfect", "effective", "nice", "cute",
+    "repurchas", "absorbs well", "absorbs quickly", "cleanses well", "works well", "satisf", "best",
+    "좋", "촉촉", "순해", "순하", "진정", "추천", "재구매", "만족", "최고", "부드럽", "산뜻",
+]
+NEGATIVE = [
+    "sticky", "sticki", "greasy", "irritat", "itch", "sting", "burn", "breakout", "broke me out", "rash",
+    "redness", "drying", "pilling", "pushi", "white cast", "expensive", "overpriced", "waste", "disappoint",
+    "bad", "worse", "worst", "strong smell", "strong scent", "too strong", "leak", "return", "regret",
+    "별로", "끈적", "따가", "자극", "트러블", "아쉽", "실망", "비싸", "밀림", "백탁",
+]
+# After normalization "isn't" is "isn t", hence "t"
+NEGATORS = ["no", "not", "without", "never", "t", "not too", "almost no", "hardly", "zero", "without any", "not any", "no more"]
+# Korean negation wraps the word: "안 좋아요", "끈적임 없이", "자극적이지 않아요"
+KOREAN_NEGATED = ["안 {}", "못 {}", "{}없", "{} 없", "{}임 없", "{}이 없", "{}함 없", "{}감 없", "{}지 않", "{}적이지 않"]
+
+# aspect: (pro label, con label, terms)
+ASPECTS = {
+    "absorption": ("Absorbs quickly", "Slow to absorb", ["absorb", "흡수"]),
+    "texture": ("Light non-sticky texture", "Sticky or heavy texture",
+                ["texture", "light", "sticky", "sticki", "greasy", "heavy", "제형", "가볍", "끈적"]),
+    "hydration": ("Hydrating", "Not moisturizing enough", ["moist", "hydrat", "dry", "보습", "촉촉", "건조"]),
+    # " 순한": word start only, so 단순한 (simple) doesn't count
+    "soothing": ("Gentle and soothing", "Can irritate sensitive skin",
+                 ["sooth", "calm", "gentle", "irritat", "sensitive", "redness", "sting", "itch", "진정", "자극", " 순한", " 순해", " 순하"]),
+    "finish": ("No white cast", "Leaves a white cast", ["white cast", "백탁"]),
+    "layering": ("Layers well under makeup", "Pills under other products",
+                 ["layer", "makeup", "pill", "pushi", "밀림", "화장"]),
+    "cleansing": ("Cleanses thoroughly", "Doesn't cleanse well",
+                  ["cleans", "remov", "dead skin", "blackhead", "세정", "클렌징"]),
+    "scent": ("Pleasant scent", "Strong scent", ["scent", "smell", "fragrance", "향"]),
+    "value": ("Good value", "Pricey", ["price", "value", "expensive", "cheap", "worth", "가격", "가성비"]),
+    "packaging": ("Cute packaging", "Packaging issues",
+                  ["packag", "design", "cute", "collab", "pump", "bottle", "패키지", "용기", "귀여"]),
+    "repurchase": ("Shoppers repurchase it", "Not worth repurchasing",
+                   ["repurchas", "bought it again", "buying", "how many times", "재구매"]),
+    "daily_use": ("Easy for daily use", "Not for everyday use", ["daily", "every day", "all four seasons", "데일리"]),
+}
+
+_NON_WORD = re.compile(r"[^\w-]+")
+_SENTENCE = re.compile(r"(?<=[.!?。])\s+|\n+")
+
+
+def _needle(term: str) -> str:
+    return (" " + term) if term.isascii() else term
+
+
+def _batch(texts: Sequence[str]) -> np.ndarray:
+    return np.array([" " + _NON_WORD.sub(" ", t.lower()) + " " for t in texts]) if len(texts) else np.array([], dtype=str)
+
+
+def _count(batch: np.ndarray, terms: Sequence[str]) -> np.ndarray:
+    total = np.zeros(len(batch), dtype=np.int64)
+    for term in terms:
+        total += np.char.count(batch, _needle(term))
+    return total
+
+
+def negated_count(batch: np.ndarray, term: str) -> np.ndarray:
+    """Occurrences of term right after a negator (counted once even if negators overlap).
+
+    batch is lowercased with non-word runs replaced by single spaces (also used by skin_scores.classify).
+    """
+    patterns = [f" {neg} {term}" for neg in NEGATORS] if term.isascii() else [p.format(term) for p in KOREAN_NEGATED]
+    hits = np.zeros(len(batch), dtype=np.int64)
+    for p in patterns:
+        hits = np.maximum(hits, np.char.count(batch, p))
+    return hits
+
+
+def _negated(batch: np.ndarray, terms: Sequence[str]) -> np.ndarray:
+    total = np.zeros(len(batch), dtype=np.int64)
+    for term in terms:
+        total += negated_count(batch, term)
+    return total
+
+
+def polarity(texts: Sequence[str]) -> np.ndarray:
+    """(n, 2) array of [positive, negative] term counts per text, negation applied."""
+    batch = _batch(texts)
+    pos, neg = _count(batch, POSITIVE), _count(batch, NEGATIVE)
+    pos_flipped, neg_flipped = _negated(batch, POSITIVE), _negated(batch, NEGATIVE)
+    return np.stack([pos - pos_flipped + neg_flipped, neg - neg_flipped + pos_flipped], axis=1).clip(min=0)
+
+
+def aspects(texts: Sequence[str]) -> np.ndarray:
+    """(n, n_aspects) boolean mention matrix."""
+    batch = _batch(texts)
+    out = np.zeros((len(batch), len(ASPECTS)), dtype=bool)
+    for j, (_, _, terms) in enumerate(ASPECTS.values()):
+        out[:, j] = _count(batch, terms) > 0
+    return out
+
+
+@dataclass
+class LocalSummary:
+    summary: ReviewSummary
+    confidence: float
+    coverage: float  # share of reviews with at least one polar term
+    positive_reviews: int
+    negative_reviews: int
+
+    @property
+    def confident(self) -> bool:
+        return (
+            self.confidence >= LOCAL_SUMMARY_CONFIDENCE
+            and bool(self.summary.pros or self.summary.cons)
+        )
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "confidence": round(self.confidence, 2),
+            "coverage": round(self.coverage, 2),
+            "positive_reviews": self.positive_reviews,
+            "negative_reviews": self.negative_reviews,
+        }
+
+
+def _one_line(sentiment: str, pros: List[str], cons: List[str]) -> str:
+    def join(labels):
+        return ", ".join(x[0].lower() + x[1:] for x in labels[:2])
+
+    if sentiment == "positive":
+        return f"Mostly positive reviews: {join(pros)}." if pros else "Mostly positive reviews."
+    if sentiment == "negative":
+        return f"Mostly negative reviews: {join(cons)}." if cons else "Mostly negative reviews."
+    if pros and cons:
+        return f"Mixed reviews: {join(pros[:1])}, but {join(cons[:1])}."
+    return "Mixed reviews."
+
+
+def local_summary(reviews: Sequence[str], top: int = 3) -> LocalSummary:
+    """Lexicon-based ReviewSummary for a product's reviews, with a confidence in [0, 1]."""
+    sentences, owner = [], []
+    for i, review in enumerate(reviews):
+        for s in _SENTENCE.split(review or ""):
+            if s.strip():
+                sentences.append(s)
+                owner.append(i)
+    owner = np.array(owner, dtype=np.int64)
+    n = len(reviews)
+
+    pol = polarity(sentences)
+    per_review = np.zeros((n, 2), dtype=np.int64)
+    if len(owner):
+        np.add.at(per_review, owner, pol)
+    review_sign = np.sign(per_review[:, 0] - per_review[:, 1])
+    positive, negative = int((review_sign > 0).sum()), int((review_sign < 0).sum())
+    polar = positive + negative
+    coverage = float((per_review.sum(axis=1) > 0).mean()) if n else 0.0
+
+    if polar and positive / polar >= POSITIVE_SHARE:
+        sentiment, clarity = "positive", positive / polar
+    elif polar and negative / polar >= POSITIVE_SHARE:
+        sentiment, clarity = "negative", negative / polar
+    else:
+        sentiment, clarity = "mixed", 0.5
+    confidence = coverage * clarity * min(1.0, n / FULL_CONFIDENCE_REVIEWS)
+
+    # Aspect × sentence polarity → pros and cons, most mentioned first
+    mentions = aspects(sentences)
+    sentence_sign = np.sign(pol[:, 0] - pol[:, 1]) if len(pol) else np.zeros(0)
+    pro_counts = (mentions & (sentence_sign > 0)[:, None]).sum(axis=0)
+    con_counts = (mentions & (sentence_sign < 0)[:, None]).sum(axis=0)
+    labels = list(ASPECTS.values())
+    pros = [labels[j][0] for j in np.argsort(-pro_counts, kind="stable")[:top] if pro_counts[j] > 0]
+    cons = [labels[j][1] for j in np.argsort(-con_counts, kind="stable")[:top] if con_counts[j] > 0]
+
+    summary = ReviewSummary(
+        overall_sentiment=sentiment,
+        one_line_summary=_one_line(sentiment, pros, cons),
+        pros=pros,
+        cons=cons,
+    )
+    summary._source = "local"
+    return LocalSummary(summary, confidence, coverage, positive, negative)
+
+
+def is_local(summary: ReviewSummary) -> bool:
+    return summary._source == "local"
+
+
+def main():
+    from catalog import get_catalog
+
+    catalog = get_catalog()
+    for pid in catalog.product_ids:
+        _, reviews = catalog.payload(pid)
+        local = local_summary(reviews)
+        tier = "local" if local.confident else "escalate"
+        print(f"product_id={pid} [{tier}] {local.stats()}")
+        print(f"    {local.summary.model_dump_json()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Structured output models shared by the Streamlit pages and batch jobs.
+"""
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import List, Literal
+
+
+class ReviewSummary(BaseModel):
+    overall_sentiment: Literal["positive", "mixed", "negative"] = Field(description="Overall sentiment")
+    one_line_summary: str = Field(description="One sentence summary")
+    pros: List[str] = Field(description="Top 3 pros")
+    cons: List[str] = Field(description="Top 3 cons")
+    # "local" when review_sentiment.py wrote it; not in the JSON schema or the stored JSON
+    _source: str = PrivateAttr(default="model")
+
+
+class Translation(BaseModel):
+    translated_text: str = Field(description="Translated text")
+
+
+class ChatAnswer(BaseModel):
+    answer: str = Field(description="Answer in 3-5 sentences")
+    safety_note: str = Field(description="One short safety note")
+
+
+class StreamingChatAnswer(ChatAnswer):
+    # Default only so streamed partials validate before the model reaches this field
+    safety_note: str = Field(default="", description="One short safety note")
+
+
+class SegmentTranslations(BaseModel):
+    translations: List[str] = Field(description="One translation per numbered input segment, same order")
+
+
+class ReviewTranslations(BaseModel):
+    translated_reviews: List[str] = Field(description="One translation per numbered review, same order")
+
+
+class UShopProduct(BaseModel):
+    product_name: str = Field(description="Professional product name")
+    marketing_copy: str = Field(description="2 sentences, spirited tone, ends with #GoUtes")
+    price: float = Field(ge=5.0, description="Price in USD, must be at least $5")
@@ -0,0 +1,190 @@
+"""
+Incremental skin-type scoring for data/skin_scores.json.
+
+Each review is classified into skin-type mentions (dry / oily / combination /
+sensitive / acne_prone) with a lexicon matcher vectorized over a whole batch of
+reviews (NumPy string ops, one pass per term). A review counts at most once
+per skin type, and negated mentions ("without any trouble", "자극 없이") don't
+count; negation uses the same rules as review_sentiment.py.
+
+Counts only ever grow: `sync()` reads data/reviews.jsonl from the byte offset
+it stopped at last time, in fixed-size batches, so memory stays bounded no
+matter how many reviews there are. Counts already in the file are kept as a
+baseline: the shipped file holds the baseline for the seeded reviews, with
+its offset at the end of them, so only reviews appended later are classified
+and added. Reviews the catalog collapsed as duplicates (catalog.collapsed_offsets)
+are skipped, so the skin card counts the same reviews the review list shows.
+Every update is written atomically
+(temp file + os.replace) together with the offset, so a crash can never
+double-count a batch.
+
+    python skin_scores.py            # process new reviews, print the counts
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from typing import Container, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from review_sentiment import negated_count
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SCORES_PATH = os.getenv("OLIVE_SKIN_SCORES_PATH", os.path.join(DATA_DIR, "skin_scores.json"))
+REVIEWS_PATH = os.getenv("OLIVE_REVIEWS_PATH", os.path.join(DATA_DIR, "reviews.jsonl"))
+
+SKIN_TYPES = ["dry", "oily", "combination", "sensitive", "acne_prone"]
+
+# Latin terms match at a word start (" dry" also hits "dryness"); Hangul terms anywhere
+LEXICON = {
+    "dry": ["dry", "dehydrat", "flaky", "flaking", "tightness", "건성", "건조"],
+    "oily": ["oily", "oiliness", "greasy skin", "sebum", "shiny", "지성", "유분", "피지"],
+    "combination": ["combination", "combo skin", "t-zone", "복합성"],
+    "sensitive": ["sensitive", "sensitivity", "irritat", "redness", "stinging", "itch", "민감", "따가"],
+    "acne_prone": ["acne", "breakout", "pimple", "blemish", "trouble", "여드름", "트러블", "뾰루지"],
+}
+_NON_WORD = re.compile(r"[^\w-]+")
+_STATE_KEY = "_state"
+
+
+def classify(texts: Sequence[str]) -> np.ndarray:
+    """(n_reviews, n_skin_types) boolean mention matrix for a batch of reviews.
+
+    Each lexicon term is one np.char.count over the whole batch; negations are
+    only checked on the (few) reviews that contain the term.
+    """
+    mentions = np.zeros((len(texts), len(SKIN_TYPES)), dtype=bool)
+    if not len(texts):
+        return mentions
+    batch = np.array([" " + _NON_WORD.sub(" ", t.lower()) for t in texts])
+    for j, t in enumerate(SKIN_TYPES):
+        for term in LEXICON[t]:
+            hits = np.char.count(batch, (" " + term) if term.isascii() else term)
+            rows = np.flatnonzero(hits)
+            if len(rows):
+                mentions[rows, j] |= hits[rows] > negated_count(batch[rows], term)
+    return mentions
+
+
+class SkinScoreEngine:
+    def __init__(self, scores_path: str = SCORES_PATH, reviews_path: str = REVIEWS_PATH):
+        self.scores_path = scores_path
+        self.reviews_path = reviews_path
+        self._lock = threading.Lock()
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.state = {"reviews_offset": 0, "reviews_seen": 0}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.scores_path):
+            return
+        with open(self.scores_path, encoding="utf-8") as f:
+            raw = json.load(f)
+        self.state.update(raw.pop(_STATE_KEY, {}))
+        self.counts = {pid: {t: int(c.get(t, 0)) for t in SKIN_TYPES} for pid, c in raw.items()}
+
+    def _save(self):
+        payload = dict(self.counts)
+        payload[_STATE_KEY] = self.state
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.scores_path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+                f.write("\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.scores_path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _apply(self, product_ids: Sequence[str], texts: Sequence[str]):
+        mentions = classify(texts)
+        pids, inverse = np.unique(np.asarray(product_ids, dtype=str), return_inverse=True)
+        per_product = np.zeros((len(pids), len(SKIN_TYPES)), dtype=np.int64)
+        np.add.at(per_product, inverse, mentions.astype(np.int64))
+        for pid, row in zip(pids.tolist(), per_product.tolist()):
+            c = self.counts.setdefault(pid, {t: 0 for t in SKIN_TYPES})
+            for t, n in zip(SKIN_TYPES, row):
+                c[t] += n
+
+    def add_reviews(self, product_id: str, texts: Iterable[str]):
+        """Count newly arrived reviews for one product and persist."""
+        texts = list(texts)
+        with self._lock:
+            self._apply([str(product_id)] * len(texts), texts)
+            self._save()
+
+    def sync(self, batch_size: int = 10_000, exclude: Container[int] = ()) -> int:
+        """Process reviews appended to reviews.jsonl since the last sync. Returns #new reviews.
+
+        exclude holds byte offsets of reviews not to count (collapsed duplicates).
+        """
+        if not os.path.exists(self.reviews_path):
+            return 0
+        processed = 0
+        with self._lock, open(self.reviews_path, "rb") as f:
+            if os.path.getsize(self.reviews_path) < self.state["reviews_offset"]:
+                raise RuntimeError("reviews file shrank since the last sync; counts would no longer match")
+            f.seek(self.state["reviews_offset"])
+            while True:
+                pids, texts = [], []
+                pos = f.tell()
+                for line in iter(f.readline, b""):
+                    if not line.endswith(b"\n"):
+                        f.seek(-len(line), os.SEEK_CUR)  # partially written line: pick it up next time
+                        break
+                    offset, pos = pos, pos + len(line)
+                    if line.strip() and offset not in exclude:
+                        rec = json.loads(line)
+                        pids.append(str(rec["product_id"]))
+                        texts.append(rec["text"])
+                    if len(texts) >= batch_size:
+                        break
+                if not texts:
+                    offset = f.tell()
+                    if offset != self.state["reviews_offset"]:
+                        self.state["reviews_offset"] = offset
+                        self._save()
+                    break
+                self._apply(pids, texts)
+                self.state["reviews_offset"] = f.tell()
+                self.state["reviews_seen"] += len(texts)
+                self._save()
+                processed += len(texts)
+        return processed
+
+    def get(self, product_id: str) -> Optional[Dict[str, int]]:
+        with self._lock:
+            c = self.counts.get(str(product_id))
+            return dict(c) if c else None
+
+
+_engine: Optional[SkinScoreEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> SkinScoreEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = SkinScoreEngine()
+        return _engine
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from catalog import get_catalog
+
+    engine = get_engine()
+    n = engine.sync(exclude=get_catalog().collapsed_offsets)
+    print(f"processed {n} new reviews (total seen: {engine.state['reviews_seen']})")
+    for pid, c in engine.counts.items():
+        print(pid, " ".join(f"{t}={c[t]}" for t in SKIN_TYPES))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Lightweight timing spans for the QR landing flows.
+
+A span is a named, timed block; spans opened inside another span become its
+children, so one button press produces a tree:
+
+    with trace("chat", product_id="3") as root:       # PROJECT.py, per action
+        with span("retrieve"):                         # flows.py
+            ...
+        with span("model_call") as s:                  # llm_cache.py
+            ...
+            annotate(input_tokens=..., output_tokens=...)
+    root.to_dict()                                     # JSON-ready tree
+
+The current span lives in a contextvar, so it follows asyncio tasks (gather)
+and coroutines handed to async_runner. Outside a trace, span() still times
+the block but nothing is kept.
+"""
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+_current: contextvars.ContextVar = contextvars.ContextVar("timing_span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    start: float = field(default_factory=time.perf_counter)
+    end: Optional[float] = None
+    children: List["Span"] = field(default_factory=list)
+
+    @property
+    def ms(self) -> float:
+        return ((self.end if self.end is not None else time.perf_counter()) - self.start) * 1000
+
+    def walk(self) -> Iterator["Span"]:
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+    def totals(self) -> Dict[str, int]:
+        """Token usage and cache hits summed over the tree."""
+        out = {"input_tokens": 0, "output_tokens": 0, "model_calls": 0, "cache_hits": 0}
+        for s in self.walk():
+            out["input_tokens"] += s.attrs.get("input_tokens", 0)
+            out["output_tokens"] += s.attrs.get("output_tokens", 0)
+            out["model_calls"] += s.name == "model_call"
+            out["cache_hits"] += bool(s.attrs.get("cache_hit"))
+        return out
+
+    def to_dict(self, origin: Optional[float] = None) -> dict:
+        origin = self.start if origin is None else origin
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 2),
+            "ms": round(self.ms, 2),
+            "attrs": dict(self.attrs),
+            "children": [c.to_dict(origin) for c in list(self.children)],
+        }
+
+    def format(self, indent: str = "") -> str:
+        """Indented text tree, e.g. for st.code."""
+        attrs = " ".join(f"{k}={v}" for k, v in self.attrs.items())
+        lines = [f"{indent}{self.name:<{max(1, 28 - len(indent))}} {self.ms:>9.1f} ms  {attrs}".rstrip()]
+        for c in list(self.children):
+            lines.append(c.format(indent + "  "))
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """Time the block as a child of the current span."""
+    parent = _current.get()
+    s = Span(name, attrs)
+    if parent is not None:
+        parent.children.append(s)
+    token = _current.set(s)
+    try:
+        yield s
+    except (GeneratorExit, asyncio.CancelledError):
+        raise  # abandoned (consumer stopped early or task cancelled), not failed
+    except BaseException as e:
+        s.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        s.end = time.perf_counter()
+        with contextlib.suppress(ValueError):  # async generator finalized in another context
+            _current.reset(token)
+
+
+def annotate(**attrs):
+    """Attach attributes (token usage, sizes, ...) to the current span, if any."""
+    s = _current.get()
+    if s is not None:
+        s.attrs.update(attrs)
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+class TraceLog:
+    """Bounded list of finished root spans (newest last)."""
+
+    def __init__(self, maxlen: int = 20):
+        self.maxlen = maxlen
+        self._items: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, root: Span):
+        with self._lock:
+            self._items.append(root)
+            del self._items[:-self.maxlen]
+
+    def items(self) -> List[Span]:
+        with self._lock:
+            return list(self._items)
+
+    def export(self) -> dict:
+        return {
+            "exported_at": time.time(),
+            "traces": [dict(r.to_dict(), totals=r.totals()) for r in self.items()],
+        }
+
+
+@contextlib.contextmanager
+def trace(name: str, log: Optional[TraceLog] = None, **attrs):
+    """Root span for one user action; added to log when it finishes.
+
+    Starts a fresh tree even if a span is already open.
+    """
+    root = Span(name, attrs)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        root.end = time.perf_counter()
+        _current.reset(token)
+        if log is not None:
+            log.add(root)
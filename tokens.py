@@ -0,0 +1,72 @@
+"""
+Offline token estimates and token-bounded chunking.
+
+No tokenizer dependency: ~4 characters per token for Latin text and ~1 token
+per CJK/Hangul character, which is close enough for gpt-4o-mini budgeting.
+"""
+import re
+from typing import List, Sequence
+
+_WIDE = re.compile(r"[ᄀ-ᇿ぀-ヿ㄰-㆏㐀-䶿一-鿿가-힯]")
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    wide = len(_WIDE.findall(text))
+    return wide + max(1, (len(text) - wide + 3) // 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo].rstrip() + "…"
+
+
+def chunk_by_tokens(texts: Sequence[str], max_tokens: int) -> List[List[str]]:
+    """Greedy split into consecutive chunks whose estimated size fits max_tokens.
+
+    A single text larger than the budget is truncated into its own chunk.
+    """
+    chunks, current, used = [], [], 0
+    for text in texts:
+        n = estimate_tokens(text)
+        if n > max_tokens:
+            text, n = truncate_to_tokens(text, max_tokens), max_tokens
+        if current and used + n > max_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += n
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# ==============================================================================
+# Lexical tokenizer (shared by review_index.py and doc_search.py)
+# ==============================================================================
+_WORD = re.compile(r"[0-9a-z]+|[가-힣]+|[぀-ヿ一-鿿]")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i if in is it its it's me my "
+    "of on or so that the this to was were with you your can do does will just very".split()
+)
+
+
+def _stem(t: str) -> str:
+    # Just enough to match "hoodie" with "Hoodies" and "review" with "reviews"
+    if len(t) > 3 and t.endswith("s") and not t.endswith("ss") and t.isascii():
+        return t[:-1]
+    return t
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens (Hangul runs kept whole, CJK per character), stopwords dropped."""
+    return [_stem(t) for t in _WORD.findall((text or "").lower()) if t not in STOPWORDS]
@@ -0,0 +1,136 @@
+"""
+Segment-level translation memory.
+
+Input text is split into sentences; each sentence is looked up per target
+language by exact match, then by a normalized ("near-exact") key that ignores
+case, spacing and surrounding quotes; sentence-final punctuation is kept, so
+"좋아요?" never gets the translation of "좋아요.". Only the sentences that are
+still missing go to the model, and the result is reassembled in the original
+order with the original line breaks.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from result_store import DEFAULT_STORE_PATH
+
+# Sentence end (., !, ?, CJK full stops) followed by spaces, or any run of newlines
+_SPLIT = re.compile(r"((?<=[.!?。！？…])[ \t]+|\s*\n\s*)")
+_EDGE_QUOTES = re.compile(r"^[\s\"'“”‘’«»]+|[\s\"'“”‘’«»]+$")
+_SPACES = re.compile(r"\s+")
+
+
+def split_segments(text: str):
+    """(segments, separators) with len(separators) == len(segments) - 1."""
+    parts = _SPLIT.split(text or "")
+    return parts[0::2], parts[1::2]
+
+
+def normalize(segment: str) -> str:
+    s = unicodedata.normalize("NFKC", segment).casefold()
+    s = _EDGE_QUOTES.sub("", s)
+    return _SPACES.sub(" ", s).strip()
+
+
+@dataclass
+class TranslationPlan:
+    segments: List[str]
+    separators: List[str]
+    known: Dict[int, str] = field(default_factory=dict)   # segment index → translation
+    missing: List[str] = field(default_factory=list)      # unique untranslated segments
+
+    def assemble(self, translations: Sequence[str] = ()) -> str:
+        """Join known + newly translated segments in order.
+
+        Segments without a translation (yet) are left out, never shown in the
+        source language.
+        """
+        new = {seg: t for seg, t in zip(self.missing, translations) if t.strip()}
+        out = []
+        for i, seg in enumerate(self.segments):
+            piece = self.known.get(i, new.get(seg)) if seg.strip() else seg
+            if piece is None:
+                continue
+            if out:
+                out.append(self.separators[i - 1])
+            out.append(piece)
+        return "".join(out)
+
+
+class TranslationMemory:
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translation_memory (
+                lang TEXT NOT NULL,
+                source TEXT NOT NULL,
+                norm TEXT NOT NULL,
+                target TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (lang, source)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS translation_memory_norm ON translation_memory(lang, norm)")
+
+    def lookup(self, lang: str, segment: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT target FROM translation_memory WHERE lang = ? AND source = ?", (lang, segment)
+            ).fetchone()
+            if row is None:
+                row = self._conn.execute(
+                    "SELECT target FROM translation_memory WHERE lang = ? AND norm = ? LIMIT 1",
+                    (lang, normalize(segment)),
+                ).fetchone()
+        return row[0] if row else None
+
+    def add(self, lang: str, sources: Sequence[str], targets: Sequence[str]):
+        now = time.time()
+        rows = [(lang, s, normalize(s), t, now) for s, t in zip(sources, targets) if s.strip() and t.strip()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translation_memory(lang, source, norm, target, updated_at) VALUES(?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def plan(self, text: str, lang: str) -> TranslationPlan:
+        segments, separators = split_segments(text)
+        plan = TranslationPlan(segments, separators)
+        seen = set()
+        for i, seg in enumerate(segments):
+            if not seg.strip():
+                continue
+            hit = self.lookup(lang, seg)
+            if hit is not None:
+                plan.known[i] = hit
+            elif seg not in seen:
+                seen.add(seg)
+                plan.missing.append(seg)
+        return plan
+
+    def __len__(self) -> int:
+        with self._lock:
+            (n,) = self._conn.execute("SELECT COUNT(*) FROM translation_memory").fetchone()
+        return n
+
+
+_memory: Optional[TranslationMemory] = None
+_memory_lock = threading.Lock()
+
+
+def get_memory() -> TranslationMemory:
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = TranslationMemory()
+        return _memory
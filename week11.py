@@ -1,8 +1,9 @@
 import streamlit as st
+import hashlib
+import io
 import os
-import asyncio
-from pydantic_ai import Agent
-from pydantic import BaseModel, Field
+from async_runner import run_async
+from week11_batch import generate_listing, iter_rows, run_batch
 
 # Set page title and layout
 st.set_page_config(page_title="U-Shop AI Pipeline", layout="wide")
@@ -166,6 +167,31 @@ with left_column:
         st.write("") 
         run_automation = st.button("⚡ Run Generation Pipeline", type="primary", use_container_width=True)
 
+    # BATCH MODE: one listing per row of a CSV / JSONL catalog (see week11_batch.py for the CLI)
+    with st.container(border=True):
+        st.markdown("#### 📦 Batch Mode")
+        batch_file = st.file_uploader("Catalog (.csv or .jsonl)", type=["csv", "jsonl"])
+        bc1, bc2 = st.columns(2)
+        text_field = bc1.text_input("Description column", value="description")
+        id_field = bc2.text_input("ID column", value="id")
+        concurrency = st.slider("Concurrent generations", 1, 16, 4)
+        run_batch_mode = st.button("📦 Generate All Listings", use_container_width=True, disabled=batch_file is None)
+
+if batch_file is not None and run_batch_mode:
+    if not api_key_input:
+        st.error("🔒 Please activate Phase 1 with your API Key.")
+    else:
+        raw = batch_file.getvalue()
+        # Same upload → same output file, so a re-run resumes instead of starting over
+        output_path = os.path.join("outputs", f"{os.path.splitext(batch_file.name)[0]}-{hashlib.sha256(raw).hexdigest()[:8]}.jsonl")
+        fmt = "csv" if batch_file.name.lower().endswith(".csv") else "jsonl"
+        rows = iter_rows(io.StringIO(raw.decode("utf-8-sig"), newline=""), fmt)
+        with st.spinner("✨ Generating listings..."):
+            counts = run_async(run_batch(rows, output_path, system_prompt, concurrency, text_field, id_field), timeout=None)
+        st.success(" · ".join(f"{k}: {v}" for k, v in counts.items()) + f" → `{output_path}`")
+        with open(output_path, "rb") as f:
+            st.download_button("⬇️ Download listings (.jsonl)", f.read(), file_name=os.path.basename(output_path))
+
 # ==============================================================================
 # RIGHT COLUMN: OUTPUTS (Live Preview)
 # ==============================================================================
@@ -178,19 +204,9 @@ with right_column:
         if not api_key_input:
             st.error("🔒 Please activate Phase 1 with your API Key.")
         else:
-            async def generate_product():
-                class UShopProduct(BaseModel):
-                    product_name: str = Field(description="Professional product name")
-                    marketing_copy: str = Field(description="2 sentences, spirited tone, ends with #GoUtes")
-                    price: float = Field(ge=5.0, description="Price in USD, must be at least $5")
-                    
-                agent = Agent("openai:gpt-4o-mini", output_type=UShopProduct, system_prompt=system_prompt)
-                result = await agent.run(user_prompt)
-                return result.output
-
             try:
                 with st.spinner("✨ AI is crafting the product..."):
-                    data = asyncio.run(generate_product())
+                    data = run_async(generate_listing(user_prompt, system_prompt))
                 
                 # RENDER LIVE ECOMMERCE PREVIEW (HTML)
                 real_card_html = render_product_card(
@@ -0,0 +1,199 @@
+"""
+Batch mode for week11.py: U-Shop listings for a whole CSV / JSONL catalog.
+
+Rows are streamed from the input (never loaded all at once) into a bounded
+queue and generated by a fixed number of workers. Each result is appended to
+the output JSONL as soon as it is ready, one line per row:
+
+    {"id": "hoodie-01", "status": "ok", "output": {"product_name": ..., "marketing_copy": ..., "price": ...}}
+    {"id": "mug-07", "status": "error", "error": "ModelHTTPError: ..."}
+
+The output file is the checkpoint: on restart, rows whose id already has an
+"ok" line are skipped, failed rows are tried again, and a half-written last
+line (killed mid-write) is ignored. Calls go through the shared rate limiter
+under one session_id, so a batch can't starve the kiosk pages.
+
+    python week11_batch.py products.csv listings.jsonl
+    python week11_batch.py products.jsonl listings.jsonl --text-field desc --id-field sku --concurrency 8
+    python week11_batch.py products.csv listings.jsonl --retry-failed=false   # resume, skip failed rows too
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set
+
+from agents import get_agent
+from rate_limit import call_limited
+from request_log import log_context
+from schemas import UShopProduct
+from tokens import estimate_tokens
+
+MODEL_NAME = "openai:gpt-4o-mini"
+DEFAULT_PERSONA = "You are a professional U-Shop marketing expert for the University of Utah."
+DEFAULT_CONCURRENCY = 4
+TEXT_FIELD = "description"
+ID_FIELD = "id"
+
+
+async def generate_listing(user_prompt: str, system_prompt: str = DEFAULT_PERSONA) -> UShopProduct:
+    """One UShopProduct from a free-text product description (also used by week11.py)."""
+    agent = get_agent(MODEL_NAME, UShopProduct, system_prompt)
+    # Same process-wide OpenAI quota as PROJECT.py (fair queue + 429 backoff)
+    result = await call_limited(MODEL_NAME, lambda: agent.run(user_prompt), estimate_tokens(system_prompt + user_prompt))
+    return result.output
+
+
+def build_listing_prompt(row: dict, text_field: str = TEXT_FIELD, id_field: str = ID_FIELD) -> str:
+    """The description column, then any other non-empty columns as "key: value" details."""
+    details = [f"{k}: {v}" for k, v in row.items() if k not in (text_field, id_field) and str(v or "").strip()]
+    text = str(row.get(text_field) or "").strip()
+    return "\n".join([text] + (["", "Details:"] + details if details else []))
+
+
+# ==============================================================================
+# Input / checkpoint
+# ==============================================================================
+def read_rows(path: str) -> Iterator[dict]:
+    """Stream rows from a .csv (header row) or .jsonl file."""
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        yield from iter_rows(f, "csv" if path.lower().endswith(".csv") else "jsonl")
+
+
+def iter_rows(lines: Iterable[str], fmt: str) -> Iterator[dict]:
+    if fmt == "csv":
+        yield from csv.DictReader(lines)
+        return
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def completed_ids(output_path: str, include_failed: bool = False) -> Set[str]:
+    """Row ids that already have a result line (only "ok" ones unless include_failed)."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted run
+            if rec.get("status") == "ok" or include_failed:
+                done.add(str(rec.get("id")))
+    return done
+
+
+def _open_for_append(output_path: str):
+    """Append mode, starting on a fresh line if the last write was cut short."""
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    f = open(output_path, "a+", encoding="utf-8")
+    if f.tell():
+        f.seek(f.tell() - 1)
+        if f.read(1) != "\n":
+            f.write("\n")
+    return f
+
+
+# ==============================================================================
+# Runner
+# ==============================================================================
+async def run_batch(
+    rows: Iterable[dict],
+    output_path: str,
+    system_prompt: str = DEFAULT_PERSONA,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    text_field: str = TEXT_FIELD,
+    id_field: str = ID_FIELD,
+    retry_failed: bool = True,
+    on_result: Optional[Callable[[dict], None]] = None,
+) -> Dict[str, int]:
+    """Generate a listing per row into output_path, skipping rows done in earlier runs.
+
+    Rows without id_field are identified by their 1-based row number.
+    """
+    done = completed_ids(output_path, include_failed=not retry_failed)
+    counts = {"ok": 0, "failed": 0, "skipped": 0, "empty": 0}
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    seen: Set[str] = set()
+
+    with _open_for_append(output_path) as out, log_context(session_id=f"batch:{os.path.basename(output_path)}"):
+
+        def write(rec: dict):
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            out.flush()
+            if on_result is not None:
+                on_result(rec)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                row_id, row = item
+                try:
+                    data = await generate_listing(build_listing_prompt(row, text_field, id_field), system_prompt)
+                    rec = {"id": row_id, "status": "ok", "output": data.model_dump()}
+                    counts["ok"] += 1
+                except Exception as e:
+                    rec = {"id": row_id, "status": "error", "error": f"{type(e).__name__}: {e}"}
+                    counts["failed"] += 1
+                write(rec)
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+        try:
+            for n, row in enumerate(rows, start=1):
+                row_id = str(row.get(id_field) or n)
+                if row_id in done or row_id in seen:
+                    counts["skipped"] += 1
+                    continue
+                seen.add(row_id)
+                if not str(row.get(text_field) or "").strip():
+                    counts["empty"] += 1
+                    write({"id": row_id, "status": "error", "error": f"empty {text_field!r}"})
+                    continue
+                await queue.put((row_id, row))  # blocks while the workers are busy: bounded memory
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for w in workers:
+                w.cancel()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help=".csv (with a header row) or .jsonl")
+    parser.add_argument("output", help="results .jsonl (appended to; also the resume checkpoint)")
+    parser.add_argument("--persona", default=DEFAULT_PERSONA, help="System persona for the listings")
+    parser.add_argument("--text-field", default=TEXT_FIELD)
+    parser.add_argument("--id-field", default=ID_FIELD)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--retry-failed", type=lambda v: v.lower() not in ("0", "false", "no"), default=True,
+                        help="retry rows that failed in an earlier run (default true)")
+    args = parser.parse_args(argv)
+
+    if not os.getenv("OPENAI_API_KEY"):
+        parser.error("OPENAI_API_KEY is not set")
+
+    def report(rec: dict):
+        if rec["status"] == "ok":
+            out = rec["output"]
+            print(f"[ok] id={rec['id']}: {out['product_name']} · ${out['price']:.2f}")
+        else:
+            print(f"[failed] id={rec['id']}: {rec['error']}", file=sys.stderr)
+
+    counts = asyncio.run(run_batch(
+        read_rows(args.input), args.output, args.persona, args.concurrency,
+        args.text_field, args.id_field, args.retry_failed, on_result=report,
+    ))
+    print(", ".join(f"{k}={v}" for k, v in counts.items()))
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())